@@ -12,5 +12,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemonFinal.settings')
+os.environ.setdefault('LITTLELEMON_ASYNC_VIEWS', '1')  # async GET handlers, see littlelemon/async_views.py
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,7 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'littlelemon.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'littlelemon.middleware.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,6 +76,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'LittleLemonFinal.wsgi.application'
 
+# Serve the read endpoints with the async views (littlelemon/async_views.py); asgi.py turns this on
+ASYNC_READ_VIEWS = os.environ.get('LITTLELEMON_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -80,10 +86,100 @@ WSGI_APPLICATION = 'LittleLemonFinal.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # LITTLELEMON_DB points benchmarks and experiments at a scratch database
+        'NAME': os.environ.get('LITTLELEMON_DB', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Production SQLite mode (LITTLELEMON_SQLITE_PRODUCTION=1): WAL so readers never block
+# writers, tuned pragmas on every connection, persistent connections, BEGIN IMMEDIATE for
+# write transactions and one queued writer per process (littlelemon/db/base.py).
+SQLITE_PRODUCTION = os.environ.get('LITTLELEMON_SQLITE_PRODUCTION') == '1'
+
+if SQLITE_PRODUCTION:
+    DATABASES['default'].update({
+        'ENGINE': 'littlelemon.db',
+        'CONN_MAX_AGE': None,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # seconds a writer waits for the lock before failing
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'  # 256 MB
+                'PRAGMA cache_size=-65536;'    # 64 MB
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+    })
+
+# Read replicas (LITTLELEMON_REPLICAS=/tmp/replica1.sqlite3,/tmp/replica2.sqlite3): copies of
+# the primary refreshed by `manage.py sync_replicas`. Reads that can lag go to a replica;
+# writes and a client's reads within REPLICA_PIN_SECONDS of its last write use the primary.
+DATABASE_REPLICAS = []
+for number, name in enumerate(filter(None, os.environ.get('LITTLELEMON_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dict(DATABASES['default'], NAME=name, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['littlelemon.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; set LITTLELEMON_CACHE_DIR to share one file-based cache between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'littlelemon',
+    }
+}
+
+if os.environ.get('LITTLELEMON_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['LITTLELEMON_CACHE_DIR'],
+    }
+
+# Alias and lifetime of the pre-rendered menu responses (keys also carry the menu version)
+MENU_CACHE_ALIAS = 'default'
+MENU_CACHE_TIMEOUT = 60 * 60
+
+# Seconds a user's group names stay cached between requests (group views invalidate immediately)
+ROLE_CACHE_TIMEOUT = 60
+
+# Token -> user lookups: shared cache lifetime, and the per-process LRU in front of it
+TOKEN_CACHE_TIMEOUT = 60 * 5
+TOKEN_CACHE_LOCAL_SIZE = 4096
+TOKEN_CACHE_LOCAL_TIMEOUT = 5
+
+# Idempotency-Key on POST: how long responses are replayable, and how long an unfinished
+# request holds its key (a crashed worker's key is taken over after that)
+IDEMPOTENCY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+# Order events (GET /api/orders/events): broker class, keepalive interval (seconds) and how many
+# unread events a subscriber may fall behind before its stream is closed
+ORDER_EVENTS_BROKER = 'littlelemon.events.LocalBroker'
+ORDER_EVENTS_KEEPALIVE = 15
+ORDER_EVENTS_QUEUE_SIZE = 1000
+
+# Per-request SQL/serialize/total timings: Server-Timing header and the histograms behind
+# GET /api/metrics (littlelemon/metrics.py); LITTLELEMON_METRICS=0 turns them off
+REQUEST_METRICS = os.environ.get('LITTLELEMON_METRICS', '1') != '0'
+
+# Raise when a request runs more queries than its view's query_budget (littlelemon/metrics.py):
+# on in development, off in production; tests turn it on through TEST_RUNNER and APITestCase
+ENFORCE_QUERY_BUDGETS = DEBUG
+TEST_RUNNER = 'littlelemon.test_runner.TestRunner'
+
+# Rate-limit counters (littlelemon/throttling.py), shared by every worker so limits hold across
+# processes: this SQLite file (LITTLELEMON_THROTTLE_DB), or when unset the default cache if it is
+# Redis or Memcached, else throttle.sqlite3 next to manage.py
+THROTTLE_STORE = os.environ.get('LITTLELEMON_THROTTLE_DB')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,13 +215,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'littlelemon.renderers.FastJSONRenderer',  # JSONRenderer's bytes; rendering time is measured
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'littlelemon.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -133,9 +229,9 @@ REST_FRAMEWORK.update({
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',   # unauthenticated
-        'rest_framework.throttling.UserRateThrottle',   # authenticated
-        'rest_framework.throttling.ScopedRateThrottle', # per-endpoint scopes (optional)
+        'littlelemon.throttling.AnonRateThrottle',   # unauthenticated
+        'littlelemon.throttling.UserRateThrottle',   # authenticated
+        'littlelemon.throttling.ScopedRateThrottle', # per-endpoint scopes (optional)
     ],
 
     'DEFAULT_THROTTLE_RATES': {
@@ -0,0 +1,217 @@
+"""
+Async read paths for ASGI deployments (asgi.py sets LITTLELEMON_ASYNC_VIEWS=1).
+
+Each view answers GET for the same URL as its sync counterpart in views.py, with the
+same permissions, throttle scope, filters, pagination and response body, but awaits
+authentication, roles, throttling and the ORM instead of holding a thread per request.
+Filtering and pagination reuse the sync view's configuration; DRF paginators are sync,
+so they run through sync_to_async exactly like Django's own async ORM methods do.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from . import views
+from .authentication import CachedTokenAuthentication
+from .cache import MenuCacheMixin
+from .events import Overflow, can_see, get_broker
+from .models import CartItem, MenuItem
+from .renderers import FastJSONRenderer
+from .roles import DELIVERY_CREW, MANAGER, aget_roles
+from .serializers import CartItemSerializer, MenuItemSerializer, OrderSerializer
+from .streaming import NDJSON_CONTENT_TYPE, STREAM_CHUNK_SIZE, andjson_lines
+from .throttling import ScopedRateThrottle
+
+
+class AsyncAPIView(View):
+    authentication_class = CachedTokenAuthentication
+    throttle_class = ScopedRateThrottle
+    throttle_scope = None
+    http_method_names = ['get']
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = Request(request)
+        try:
+            await self.initial(self.request)
+            if request.method.lower() not in self.http_method_names:
+                raise exceptions.MethodNotAllowed(request.method)
+            response = await getattr(self, request.method.lower())(self.request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as exc:
+            response = self.handle_exception(exc)
+        if isinstance(response, Response):
+            response = self.render(response)
+        return response
+
+    async def initial(self, request):
+        authenticator = self.authentication_class()
+        result = await authenticator.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+        self.roles = await aget_roles(request.user)  # memoized on the user for sync helpers too
+        if not self.has_permission(request):
+            raise exceptions.PermissionDenied()
+        throttle = self.throttle_class()
+        if not await throttle.aallow_request(request, self):
+            raise exceptions.Throttled(throttle.wait())
+
+    def has_permission(self, request):
+        return True  # authenticated
+
+    def handle_exception(self, exc):
+        response = exception_handler(exc, {'view': self, 'request': self.request})
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            response['WWW-Authenticate'] = self.authentication_class().authenticate_header(self.request)
+        return response
+
+    def render(self, response):
+        rendered = HttpResponse(FastJSONRenderer().render(response.data), status=response.status_code,
+                                content_type='application/json')
+        for name, value in response.items():
+            rendered[name] = value
+        return rendered
+
+    def sync_view(self, view_class, **kwargs):
+        # Configured instance of the sync view, for its queryset, filters and paginator
+        return view_class(request=self.request, args=(), kwargs=kwargs, format_kwarg=None)
+
+    async def fast_list(self, view):
+        # The sync view's serializer-free list (fastpath.FastListMixin); paginators are sync
+        data, paginated = await sync_to_async(view.fast_data)()
+        return view.get_paginated_response(data) if paginated else Response(data)
+
+
+class MenuItemsView(MenuCacheMixin, AsyncAPIView):
+    throttle_scope = 'menu'
+
+    async def get(self, request):
+        view = self.sync_view(views.MenuItemsView)
+        if request.query_params.get('stream') == 'ndjson':
+            queryset = view.filter_queryset(view.get_queryset())
+            rows = queryset.values(*view.stream_fields).aiterator(chunk_size=STREAM_CHUNK_SIZE)
+            return StreamingHttpResponse(andjson_lines(rows), content_type=NDJSON_CONTENT_TYPE)
+        return await self.acached_response(request, lambda: self.fast_list(view))
+
+
+class SingleMenuItemView(MenuCacheMixin, AsyncAPIView):
+    throttle_scope = 'menu'
+
+    async def get(self, request, pk):
+        return await self.acached_response(request, lambda: self._retrieve(pk))
+
+    async def _retrieve(self, pk):
+        item = await MenuItem.objects.filter(pk=pk).afirst()
+        if item is None:
+            return Response({'error': 'Item Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(MenuItemSerializer(item).data, status=status.HTTP_200_OK)
+
+
+class CartView(AsyncAPIView):
+    throttle_scope = 'cart'
+
+    def has_permission(self, request):
+        return not (self.roles & {MANAGER, DELIVERY_CREW})  # customers only
+
+    async def get(self, request):
+        items = [ci async for ci in CartItem.objects.filter(user=request.user).select_related('menuitem')]
+        return Response(CartItemSerializer(items, many=True).data, status=status.HTTP_200_OK)
+
+
+class OrdersView(AsyncAPIView):
+    throttle_scope = 'orders'
+
+    async def get(self, request):
+        view = self.sync_view(views.OrdersView)  # role scoping uses the roles loaded above
+        return await self.fast_list(view)
+
+
+class SingleOrderView(AsyncAPIView):
+    throttle_scope = 'orders'
+
+    async def get(self, request, pk):
+        view = self.sync_view(views.SingleOrderView, pk=pk)
+        order = await view.get_read_queryset().filter(pk=pk).afirst()  # ?fields= / ?expand=
+        if order is None:
+            raise Http404('No Order matches the given query.')
+        u = request.user
+        # Access control: Customer only own, Delivery crew only assigned
+        if MANAGER not in self.roles:
+            owner_id = order.delivery_crew_id if DELIVERY_CREW in self.roles else order.user_id
+            if owner_id != u.id:
+                raise exceptions.PermissionDenied('Forbidden.')
+        fields, expand = view.sparse_fields()
+        return Response(OrderSerializer(order, fields=fields, expand=expand).data, status=status.HTTP_200_OK)
+
+
+class OrderEventsView(AsyncAPIView):
+    """
+    GET /api/orders/events[?order=<id>]  server-sent events for the orders the user may see:
+    order.created / order.updated / order.deleted with the order's id, user, delivery_crew,
+    previous_delivery_crew and status. Served by the ASGI application only; a comment line
+    every ORDER_EVENTS_KEEPALIVE seconds keeps proxies from closing the stream.
+    """
+    throttle_scope = 'orders'  # opening a stream counts as one request
+    query_budget = {'GET': 2}  # before the stream starts: token and roles
+    measure_stream = False  # open for as long as the client listens (RequestMetricsMiddleware)
+
+    async def get(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            return Response({'detail': 'Order events are served by the ASGI application (LittleLemonFinal.asgi).'},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+        try:
+            order_id = int(request.query_params['order']) if 'order' in request.query_params else None
+        except ValueError:
+            raise exceptions.ValidationError({'order': ['A valid integer is required.']})
+        user_id, roles = request.user.pk, self.roles
+        keepalive = getattr(settings, 'ORDER_EVENTS_KEEPALIVE', 15)
+        subscription = get_broker().subscribe()
+
+        async def stream():
+            try:
+                yield b'retry: 5000\n\n'  # client reconnect delay (ms)
+                while True:
+                    try:
+                        event = await subscription.get(keepalive)
+                    except Overflow:
+                        return
+                    if event is None:
+                        yield b': keepalive\n\n'
+                    elif (order_id is None or event['id'] == order_id) and can_see(user_id, roles, event):
+                        yield sse_message(event)
+            finally:
+                subscription.close()
+
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: do not buffer the stream
+        return response
+
+
+def sse_message(event):
+    data = {key: value for key, value in event.items() if key not in ('event', 'seq')}
+    return f'id: {event["seq"]}\nevent: {event["event"]}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+
+def with_async_reads(sync_view, async_view):
+    """
+    One URL, two implementations: GET goes to `async_view`, every other method to the
+    sync DRF view (run in a thread, as Django would for any sync view under ASGI).
+    """
+    sync_in_thread = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            return await async_view(request, *args, **kwargs)
+        return await sync_in_thread(request, *args, **kwargs)
+    view.view_class = sync_view.view_class  # the name metrics report
+    return csrf_exempt(view)
@@ -0,0 +1,121 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from .cache import LocalLRUCache
+from .roles import aget_roles, get_roles
+from .routers import primary_reads
+from .throttling import get_store
+
+# Short-lived per-process layer in front of the shared cache
+_local_tokens = LocalLRUCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_LOCAL_SIZE', 4096),
+    timeout=getattr(settings, 'TOKEN_CACHE_LOCAL_TIMEOUT', 5),
+)
+
+
+def _cache_key(key):
+    return f'token:{key}'
+
+
+def _revision_key(key):
+    return f'token-revision:{key}'
+
+
+def _revision_timeout():
+    # Outlives every cached copy made before the bump, so a swept revision never matches one
+    return 2 * getattr(settings, 'TOKEN_CACHE_TIMEOUT', 300)
+
+
+def _bump(key):
+    _local_tokens.delete(key)
+    cache.delete(_cache_key(key))
+    get_store().incr(_revision_key(key), 1, _revision_timeout())
+
+
+def revoke_token(key):
+    """
+    Drop the cached user of `key` in every worker. Cached copies carry the token's revision
+    from the shared counter store (throttling.get_store), which every worker reads before
+    trusting its own copy; bumping it makes them all reload. Bumped again on commit, so a
+    copy loaded from the old rows while the transaction was open is dropped too.
+    """
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication without the token/user join on every request: the user, with its
+    roles, is looked up in an in-process LRU, then the configured cache, and only then the
+    database. Either cached copy is used only while the token's revision is unchanged, one
+    read of the shared counter store per request.
+    """
+    def authenticate_credentials(self, key):
+        revision = get_store().get(_revision_key(key))
+        entry = _local_tokens.get(key)
+        if entry is None or entry[0] != revision:
+            entry = cache.get(_cache_key(key))
+            if entry is None or entry[0] != revision:
+                entry = (revision, self._load_user(key))
+                cache.set(_cache_key(key), entry, getattr(settings, 'TOKEN_CACHE_TIMEOUT', 300))
+            _local_tokens.set(key, entry)
+        return self._credentials(entry[1], key)
+
+    def _load_user(self, key):
+        model = self.get_model()
+        try:
+            with primary_reads():  # a revoked token may still be on a replica
+                user = model.objects.select_related('user').get(key=key).user
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        get_roles(user)  # memoized on the user, so cached copies carry them
+        return user
+
+    def _credentials(self, user, key):
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        # Cached instance is shared between requests; hand each request its own copy
+        user = copy.copy(user)
+        return (user, self.get_model()(key=key, user=user))
+
+    # Async counterparts for the ASGI views (littlelemon.async_views)
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        revision = await get_store().aget(_revision_key(key))
+        entry = _local_tokens.get(key)
+        if entry is None or entry[0] != revision:
+            entry = await cache.aget(_cache_key(key))
+            if entry is None or entry[0] != revision:
+                entry = (revision, await self._aload_user(key))
+                await cache.aset(_cache_key(key), entry, getattr(settings, 'TOKEN_CACHE_TIMEOUT', 300))
+            _local_tokens.set(key, entry)
+        return self._credentials(entry[1], key)
+
+    async def _aload_user(self, key):
+        model = self.get_model()
+        try:
+            with primary_reads():
+                token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        await aget_roles(token.user)
+        return token.user
@@ -0,0 +1,156 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags
+
+from .renderers import FastJSONRenderer
+from .routers import primary_reads
+
+MENU_VERSION_KEY = 'menu:version'
+
+
+class LocalLRUCache:
+    """
+    Small thread-safe in-process cache: least recently used entries are evicted past
+    `max_size`, and every entry expires `timeout` seconds after it was set.
+    """
+    def __init__(self, max_size=1024, timeout=60):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def menu_cache():
+    # Any configured backend works (LocMem per process, FileBased/Redis shared across workers)
+    return caches[getattr(settings, 'MENU_CACHE_ALIAS', 'default')]
+
+
+def _fresh_version():
+    # Seed for a missing (or evicted) version key: never one that pages may still be cached under
+    return time.time_ns()
+
+
+def get_menu_version():
+    cache = menu_cache()
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        seed = _fresh_version()
+        cache.add(MENU_VERSION_KEY, seed, timeout=None)
+        version = cache.get(MENU_VERSION_KEY, seed)
+    return version
+
+
+async def aget_menu_version():
+    cache = menu_cache()
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        seed = _fresh_version()
+        await cache.aadd(MENU_VERSION_KEY, seed, timeout=None)
+        version = await cache.aget(MENU_VERSION_KEY, seed)
+    return version
+
+
+def _bump_menu_version():
+    cache = menu_cache()
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError:  # key missing or evicted
+        cache.add(MENU_VERSION_KEY, _fresh_version(), timeout=None)
+
+
+def bump_menu_version():
+    # After commit, so no reader can cache pre-commit rows under the new version
+    transaction.on_commit(_bump_menu_version)
+
+
+def menu_cache_key(request, version):
+    # Scheme and host too: cached pages carry absolute next/previous links
+    query = sorted(request.query_params.lists())
+    digest = hashlib.sha1(f'{request.build_absolute_uri(request.path)}?{query}'.encode()).hexdigest()
+    return f'menu:v{version}:{digest}'
+
+
+def _render_entry(response):
+    body = FastJSONRenderer().render(response.data)
+    return ('"%s"' % hashlib.sha1(body).hexdigest(), body)
+
+
+def _entry_response(request, entry):
+    etag, body = entry
+    client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in client_etags or '*' in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+class MenuCacheMixin:
+    """
+    Serves GETs from pre-rendered JSON keyed on the menu version; answers If-None-Match with 304.
+    """
+    def cached_response(self, request, render):
+        cache = menu_cache()
+        key = menu_cache_key(request, get_menu_version())
+        entry = cache.get(key)
+        if entry is None:
+            with primary_reads():  # a replica may not have the rows of the version just bumped
+                response = render()
+            if response.status_code != 200:
+                return response
+            entry = _render_entry(response)
+            cache.set(key, entry, getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60))
+        return _entry_response(request, entry)
+
+    async def acached_response(self, request, render):
+        # Same, for async views: `render` is a coroutine function returning a Response
+        cache = menu_cache()
+        key = menu_cache_key(request, await aget_menu_version())
+        entry = await cache.aget(key)
+        if entry is None:
+            with primary_reads():
+                response = await render()
+            if response.status_code != 200:
+                return response
+            entry = _render_entry(response)
+            await cache.aset(key, entry, getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60))
+        return _entry_response(request, entry)
@@ -0,0 +1,95 @@
+"""
+SQLite backend for the production SQLite mode (LITTLELEMON_SQLITE_PRODUCTION=1).
+
+Stock Django SQLite plus a serialized writer: every write transaction (an outermost
+`atomic` block, opened with BEGIN IMMEDIATE) first takes a per-database lock shared by
+all threads of the process, and holds it until the transaction ends. A write statement
+run in autocommit mode, outside any transaction (a plain `save()`, djoser creating a
+token), takes the same lock for that statement. Writers queue in order on that lock
+instead of racing inside SQLite's busy handler, so a burst of checkouts waits its turn
+rather than failing with "database is locked".
+Pragmas (WAL, synchronous, mmap, cache) come from OPTIONS['init_command'].
+"""
+import threading
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+_writer_locks = {}
+_writer_locks_guard = threading.Lock()
+# Statements that never write; anything else run in autocommit mode takes the writer lock
+_READ_ONLY = ('SELECT', 'PRAGMA', 'EXPLAIN')
+
+
+def _writer_lock(name):
+    with _writer_locks_guard:
+        return _writer_locks.setdefault(str(name), threading.Lock())
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    db = None  # the DatabaseWrapper, set by create_cursor
+
+    def execute(self, query, params=None):
+        if not self._needs_writer_lock(query):
+            return super().execute(query, params)
+        self.db._acquire_writer_lock()
+        try:
+            return super().execute(query, params)
+        finally:
+            self.db._release_writer_lock()
+
+    def executemany(self, query, param_list):
+        if not self._needs_writer_lock(query):
+            return super().executemany(query, param_list)
+        self.db._acquire_writer_lock()
+        try:
+            return super().executemany(query, param_list)
+        finally:
+            self.db._release_writer_lock()
+
+    def _needs_writer_lock(self, query):
+        # In a transaction, or BEGIN itself, the lock is already held
+        return not (self.connection.in_transaction or self.db._holds_writer_lock
+                    or query.lstrip().upper().startswith(_READ_ONLY))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _holds_writer_lock = False
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.db = self
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        self._acquire_writer_lock()
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            self._release_writer_lock()
+            raise
+
+    def _set_autocommit(self, autocommit):
+        try:
+            super()._set_autocommit(autocommit)
+        finally:
+            if autocommit:
+                self._release_writer_lock()  # the atomic block has committed or rolled back
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_writer_lock()
+
+    def _acquire_writer_lock(self):
+        lock = _writer_lock(self.settings_dict['NAME'])
+        # Same patience as SQLite's own busy timeout
+        if not lock.acquire(timeout=self.settings_dict['OPTIONS'].get('timeout', 5)):
+            raise OperationalError('database is locked (timed out waiting for the writer lock)')
+        self._holds_writer_lock = True
+
+    def _release_writer_lock(self):
+        if self._holds_writer_lock:
+            self._holds_writer_lock = False
+            _writer_lock(self.settings_dict['NAME']).release()
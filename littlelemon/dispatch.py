@@ -0,0 +1,119 @@
+"""
+Automatic delivery dispatch: unassigned orders go to the delivery crew member with the
+fewest open deliveries (orders assigned to them and not yet delivered).
+
+Loads are read with one grouped COUNT, kept in a min-heap while the batch is planned
+(oldest orders first, O(log crew) per order), and written with one UPDATE per
+UPDATE_BATCH orders: delivery_crew = CASE WHEN id IN (...) THEN <crew> ... END. The UPDATE
+returns the rows it changed, and only those are reported and published.
+"""
+import heapq
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .events import UPDATED, order_event, publish_order_events
+from .models import Order, User
+from .roles import DELIVERY_CREW
+
+OUT_FOR_DELIVERY = 0
+UPDATE_BATCH = 5000  # orders per UPDATE: two bound parameters each (and one per crew member), under SQLite's 32766
+
+
+def crew_loads(crew=None):
+    # {crew member id: open deliveries} for every active member of the Delivery crew group (or of `crew`)
+    members = User.objects.filter(groups__name=DELIVERY_CREW, is_active=True)
+    if crew is not None:
+        members = members.filter(pk__in=crew)
+    loads = dict.fromkeys(members.values_list('id', flat=True), 0)
+    open_deliveries = (
+        Order.objects.filter(delivery_crew__in=loads, status=OUT_FOR_DELIVERY)
+        .values('delivery_crew').annotate(count=Count('id')).order_by()
+    )
+    for row in open_deliveries:
+        loads[row['delivery_crew']] = row['count']
+    return loads
+
+
+def plan(order_ids, loads, capacity=None):
+    """
+    Give each order, in turn, to the least-loaded crew member (ties: lowest id).
+    Members at `capacity` open deliveries get no more. Returns {crew id: [order ids]}.
+    """
+    heap = [(load, crew_id) for crew_id, load in loads.items() if capacity is None or load < capacity]
+    heapq.heapify(heap)
+    assignments = defaultdict(list)
+    for order_id in order_ids:
+        if not heap:
+            break
+        load, crew_id = heap[0]
+        assignments[crew_id].append(order_id)
+        if capacity is None or load + 1 < capacity:
+            heapq.heapreplace(heap, (load + 1, crew_id))
+        else:
+            heapq.heappop(heap)
+    return assignments
+
+
+def assign(assignments):
+    """
+    Write a plan, leaving alone orders assigned or delivered meanwhile by someone else.
+    Returns {crew id: [order ids]} for the orders the UPDATEs actually changed
+    (UPDATE ... RETURNING; the ORM's update() only returns a count).
+    """
+    meta = Order._meta
+    qn = connection.ops.quote_name
+    table, order_id_column = qn(meta.db_table), qn(meta.pk.column)
+    crew_column, status_column = qn(meta.get_field('delivery_crew').column), qn(meta.get_field('status').column)
+    pairs = [(order_id, crew_id) for crew_id, ids in assignments.items() for order_id in ids]
+    assigned = defaultdict(list)
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), UPDATE_BATCH):
+            batch = defaultdict(list)
+            for order_id, crew_id in pairs[start:start + UPDATE_BATCH]:
+                batch[crew_id].append(order_id)
+            cases, params = [], []
+            for crew_id, ids in batch.items():
+                cases.append(f'WHEN {order_id_column} IN ({", ".join(["%s"] * len(ids))}) THEN %s')
+                params += [*ids, crew_id]
+            order_ids = [order_id for order_id, _ in pairs[start:start + UPDATE_BATCH]]
+            cursor.execute(
+                f'UPDATE {table} SET {crew_column} = CASE {" ".join(cases)} END '
+                f'WHERE {order_id_column} IN ({", ".join(["%s"] * len(order_ids))}) '
+                f'AND {crew_column} IS NULL AND {status_column} = %s '
+                f'RETURNING {order_id_column}, {crew_column}',
+                params + order_ids + [OUT_FOR_DELIVERY],
+            )
+            for order_id, crew_id in cursor.fetchall():
+                assigned[crew_id].append(order_id)
+    return {crew_id: sorted(ids) for crew_id, ids in assigned.items()}
+
+
+@transaction.atomic
+def dispatch(limit=None, capacity=None, orders=None, crew=None):
+    """
+    Assign up to `limit` unassigned orders, oldest first. Returns a summary:
+    {'assigned': n, 'unassigned': orders left in this batch, 'crew': {crew id: n}}.
+    `orders` (an Order queryset) and `crew` (a User queryset) narrow the run; the
+    endpoint uses every order and the whole Delivery crew group.
+    """
+    loads = crew_loads(crew)
+    orders = (
+        (Order.objects.all() if orders is None else orders).select_for_update()
+        .filter(delivery_crew__isnull=True, status=OUT_FOR_DELIVERY)
+        .order_by('date', 'id').values_list('id', 'user_id')
+    )
+    customers = dict(orders[:limit] if limit else orders)
+    order_ids = list(customers)
+    assigned = assign(plan(order_ids, loads, capacity))
+    publish_order_events([
+        order_event(UPDATED, order_id, customers[order_id], crew_id, OUT_FOR_DELIVERY)
+        for crew_id, ids in assigned.items() for order_id in ids
+    ])
+    count = sum(len(ids) for ids in assigned.values())
+    return {
+        'assigned': count,
+        'unassigned': len(order_ids) - count,
+        'crew': {crew_id: len(ids) for crew_id, ids in assigned.items()},
+    }
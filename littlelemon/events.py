@@ -0,0 +1,152 @@
+"""
+Order change events for GET /api/orders/events (server-sent events, ASGI only).
+
+Writers call publish_order_events() inside their transaction; the events reach the broker
+after commit. The broker is settings.ORDER_EVENTS_BROKER: LocalBroker fans out to the
+subscribers of this process. A multi-node broker (Redis pub/sub, Postgres LISTEN/NOTIFY)
+only has to implement Broker.publish and Broker.subscribe.
+"""
+import asyncio
+import itertools
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .roles import DELIVERY_CREW, MANAGER
+
+CREATED = 'order.created'
+UPDATED = 'order.updated'
+DELETED = 'order.deleted'
+
+
+class Broker:
+    def publish(self, events):
+        # Called from any thread with a list of event dicts
+        raise NotImplementedError
+
+    def subscribe(self):
+        # Called on the subscriber's event loop; returns a Subscription
+        raise NotImplementedError
+
+
+class Subscription:
+    async def get(self, timeout):
+        # Next event, None after `timeout` seconds without one; raises Overflow if it fell behind
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class Overflow(Exception):
+    pass
+
+
+class LocalSubscription(Subscription):
+    def __init__(self, broker, max_queue):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_queue)
+        self.overflowed = False
+
+    def deliver(self, events):
+        self.loop.call_soon_threadsafe(self._put, events)
+
+    def _put(self, events):
+        if self.overflowed:
+            return
+        for event in events:
+            if self.queue.full():
+                # A slow client: drop what it has not read and end its stream; it reconnects
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(None)
+                self.overflowed = True
+                return
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is None:
+            raise Overflow()
+        return event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker(Broker):
+    """In-process fan-out: every subscriber of this process gets every event."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.sequence = itertools.count(1)
+
+    def publish(self, events):
+        with self.lock:
+            events = [dict(event, seq=next(self.sequence)) for event in events]
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(events)
+            except RuntimeError:  # its event loop is gone
+                self.unsubscribe(subscription)
+
+    def subscribe(self):
+        subscription = LocalSubscription(self, getattr(settings, 'ORDER_EVENTS_QUEUE_SIZE', 1000))
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'ORDER_EVENTS_BROKER', 'littlelemon.events.LocalBroker'))()
+        return _broker
+
+
+def order_event(kind, order_id, user_id, delivery_crew_id, status, previous_delivery_crew_id=None):
+    # previous_delivery_crew lets a crew member see an order being taken off them
+    return {
+        'event': kind,
+        'id': order_id,
+        'user': user_id,
+        'delivery_crew': delivery_crew_id,
+        'previous_delivery_crew': previous_delivery_crew_id,
+        'status': status,
+    }
+
+
+def instance_event(kind, order, previous_delivery_crew_id=None):
+    return order_event(kind, order.pk, order.user_id, order.delivery_crew_id, order.status, previous_delivery_crew_id)
+
+
+def publish_order_events(events):
+    # After commit, so subscribers never hear about a change that was rolled back
+    if events:
+        transaction.on_commit(lambda: get_broker().publish(events))
+
+
+def can_see(user_id, roles, event):
+    # Same visibility as SingleOrderView: managers all, crew assigned orders, customers their own
+    if MANAGER in roles:
+        return True
+    if DELIVERY_CREW in roles:
+        return user_id in (event['delivery_crew'], event['previous_delivery_crew'])
+    return event['user'] == user_id
@@ -0,0 +1,132 @@
+"""
+Serializer-free list rendering for MenuItemsView and OrdersView.
+
+Rows come from .values()/.values_list() and are turned into the serializer's exact output
+by a row function generated once from the serializer's fields: one dict literal per row,
+with only the conversions DRF would apply (decimals to strings, datetimes to ISO 8601 in
+the current time zone). Order lines are fetched in one query and grouped under their
+orders in a single pass. tests.FastPathContractTests compares the bytes with the
+serializers', so any change to a serializer must keep the two in step.
+"""
+import decimal
+import functools
+
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .metrics import serializing
+from .models import OrderItem
+from .serializers import MenuItemSerializer, OrderItemSerializer, OrderSerializer
+
+
+def _decimal(field):
+    # DecimalField.to_representation with COERCE_DECIMAL_TO_STRING
+    exponent = decimal.Decimal(1).scaleb(-field.decimal_places)
+    context = decimal.Context(prec=field.max_digits, rounding=field.rounding)
+
+    def convert(value):
+        return None if value is None else format(value.quantize(exponent, context=context), 'f')
+    return convert
+
+
+def _datetime(value):
+    # DateTimeField.to_representation for ISO 8601 with USE_TZ
+    if not value:
+        return None
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def compile_row(serializer_class, by_index=False, fields=None):
+    """
+    Build `row(r) -> dict` with the keys of `serializer_class`, reading each value from
+    `r[source]` (a .values() dict) or, with by_index, `r[i]` (a .values_list() tuple in
+    `row.sources` order). Nested serializers are left out for the caller to fill in.
+    `fields` limits the keys as SparseFieldsMixin would.
+    """
+    names, sources, converters = [], [], {}
+    for name, field in serializer_class().fields.items():
+        if fields is not None and name not in fields:
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            continue
+        if isinstance(field, serializers.DecimalField):
+            converters[name] = _decimal(field)
+        elif isinstance(field, serializers.DateTimeField):
+            converters[name] = _datetime
+        elif not isinstance(field, (serializers.IntegerField, serializers.CharField,
+                                    serializers.PrimaryKeyRelatedField)):
+            raise TypeError(f'{serializer_class.__name__}.{name}: no fast conversion for {type(field).__name__}')
+        names.append(name)
+        sources.append(field.source.replace('.', '__'))
+
+    namespace, items = {}, []
+    for i, (name, source) in enumerate(zip(names, sources)):
+        value = f'r[{i}]' if by_index else f'r[{source!r}]'
+        if name in converters:
+            namespace[f'_{i}'] = converters[name]
+            value = f'_{i}({value})'
+        items.append(f'{name!r}: {value}')
+    exec(f'def row(r):\n    return {{{", ".join(items)}}}', namespace)
+    row = namespace['row']
+    row.sources = sources
+    return row
+
+
+menu_item_row = compile_row(MenuItemSerializer)
+order_row = compile_row(OrderSerializer)
+order_item_row = compile_row(OrderItemSerializer, by_index=True)
+
+
+@functools.lru_cache(maxsize=64)
+def sparse_order_row(fields):
+    # Row function for ?fields= (a frozenset); only a handful of combinations occur in practice
+    return compile_row(OrderSerializer, fields=fields)
+
+
+def menu_items(rows):
+    return [menu_item_row(r) for r in rows]
+
+
+def orders(rows, row=order_row, expand_items=True):
+    # `rows`: .values() dicts that include id
+    if not expand_items:
+        return [row(r) for r in rows]
+    result, lines = [], {}
+    for r in rows:
+        order = row(r)
+        order['order_items'] = lines[r['id']] = []
+        result.append(order)
+    items = (
+        OrderItem.objects.filter(order_id__in=lines).order_by('order_id', 'id')
+        .values_list('order_id', *order_item_row.sources)
+    )
+    for item in items:
+        lines[item[0]].append(order_item_row(item[1:]))
+    return result
+
+
+class FastListMixin:
+    """
+    list() without serializers: the filtered, paginated queryset is read with .values()
+    and turned into rows by `fast_rows`. Pagination and response shape are unchanged.
+    """
+    fast_fields = None  # .values() names, e.g. menu_item_row.sources
+    fast_rows = None    # staticmethod: rows -> list of dicts
+
+    def get_fast_list(self):
+        # (.values() names, rows -> list of dicts) for this request
+        return self.fast_fields, self.fast_rows
+
+    def fast_data(self):
+        fields, rows = self.get_fast_list()
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*fields)
+        page = self.paginate_queryset(queryset)
+        with serializing():
+            data = rows(queryset if page is None else page)
+        return data, page is not None
+
+    def list(self, request, *args, **kwargs):
+        data, paginated = self.fast_data()
+        return self.get_paginated_response(data) if paginated else Response(data)
@@ -21,3 +21,8 @@ class OrderFilter(django_filters.FilterSet):
     class Meta:
         model = Order
         fields = ['status', 'user', 'delivery_crew', 'date_after', 'date_before']
+
+class RollupDateFilter(django_filters.FilterSet):
+    # Sales rollup rows are per day: ?date_after=2025-08-01&date_before=2025-08-31 (inclusive)
+    date_after  = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_before = django_filters.DateFilter(field_name='date', lookup_expr='lte')
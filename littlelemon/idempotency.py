@@ -0,0 +1,133 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+# A duplicate of a request in flight checks for its response after each of these delays
+# (about 3 s in all, one query each) before giving up with 409
+WAIT_DELAYS = (0.05, 0.1, 0.2, 0.4, 0.8, 1.6)
+
+
+def _store_key(request, key):
+    return hashlib.sha256(f'{request.user.pk}:{request.path}:{key}'.encode()).hexdigest()
+
+
+def _fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path} {payload}'.encode()).hexdigest()
+
+
+def _replay(entry):
+    response = HttpResponse(bytes(entry.body), status=entry.status, content_type=entry.content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def expire_keys():
+    # Delete rows past both lifetimes; returns how many
+    cutoff = timezone.now() - timedelta(seconds=max(settings.IDEMPOTENCY_TTL, settings.IDEMPOTENCY_LOCK_TIMEOUT))
+    count, _ = IdempotencyKey.objects.filter(created__lt=cutoff).delete()
+    return count
+
+
+def _claim(store_key, fingerprint):
+    """
+    (IdempotencyKey, claimed). Inserting the row is the lock: exactly one request, in any
+    worker, gets claimed=True and runs the handler. A row past its lifetime (a finished one
+    after IDEMPOTENCY_TTL, an unfinished one after IDEMPOTENCY_LOCK_TIMEOUT) is taken over.
+    A new key also deletes every expired one, so the table stays small without a cron job.
+    """
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                entry = IdempotencyKey.objects.create(key=store_key, fingerprint=fingerprint, created=now)
+            expire_keys()
+            return entry, True
+        except IntegrityError:
+            pass
+        entry = IdempotencyKey.objects.filter(key=store_key).first()
+        if entry is None:  # deleted since the INSERT failed; claim it again
+            continue
+        lifetime = settings.IDEMPOTENCY_TTL if entry.status is not None else settings.IDEMPOTENCY_LOCK_TIMEOUT
+        if now - entry.created < timedelta(seconds=lifetime):
+            return entry, False
+        # Only one of several requests taking over the same stale row wins
+        if IdempotencyKey.objects.filter(pk=entry.pk, created=entry.created).update(
+                fingerprint=fingerprint, status=None, content_type='', body=None, created=now):
+            entry.fingerprint, entry.status, entry.created = fingerprint, None, now
+            return entry, True
+
+
+def _await_response(entry):
+    # The in-flight entry once its response is stored; None if it is still running after
+    # WAIT_DELAYS, or was released because it failed (the client should retry)
+    for delay in WAIT_DELAYS:
+        time.sleep(delay)
+        entry = IdempotencyKey.objects.filter(pk=entry.pk, created=entry.created).first()
+        if entry is None or entry.status is not None:
+            return entry
+    return None
+
+
+def idempotent(handler):
+    """
+    Honour an `Idempotency-Key` header on a view method.
+
+    The first request with a key runs the handler and stores its status and rendered body
+    (IdempotencyKey, so every worker sees it) for IDEMPOTENCY_TTL seconds; repeats get those
+    exact bytes back without running it again. A duplicate that arrives while the first is
+    still running waits for its response (WAIT_DELAYS) and replays it; if the first is still
+    running after that, or fails, the duplicate gets 409 with Retry-After. Reusing a key with
+    a different body is a 422. 5xx responses are not stored, so the client can retry them.
+    """
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return handler(self, request, *args, **kwargs)
+
+        fingerprint = _fingerprint(request)
+        entry, claimed = _claim(_store_key(request, key), fingerprint)
+        if not claimed:
+            if entry.fingerprint != fingerprint:
+                return Response({'detail': 'Idempotency-Key was already used with a different request.'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if entry.status is None:
+                entry = _await_response(entry)
+            if entry is None:
+                return Response({'detail': 'A request with this Idempotency-Key is still in progress.'},
+                                status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+            return _replay(entry)
+
+        release = IdempotencyKey.objects.filter(pk=entry.pk, created=entry.created)
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            release.delete()
+            raise
+        if response.status_code >= 500:
+            release.delete()
+            return response
+
+        def store(rendered):
+            # The bytes the negotiated renderer produced, so a replay is identical
+            release.update(status=rendered.status_code, content_type=rendered['Content-Type'],
+                           body=rendered.content)
+
+        if hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+    return wrapper
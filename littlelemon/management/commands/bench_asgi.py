@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test import AsyncClient, Client
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import SimpleRateThrottle
+
+from littlelemon.models import CartItem, MenuItem, Order, OrderItem, User
+from littlelemon.rollups import purge, rebuild
+
+PREFIX = 'bench-asgi'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the read endpoints served sync (WSGI handler, thread pool) and async (ASGI '
+        'handler, one event loop) on the same dataset. Each mode runs in its own process. '
+        'Use a scratch database: LITTLELEMON_DB=/tmp/bench.sqlite3 python manage.py bench_asgi'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=32, help='requests in flight')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--menu-items', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--mode', choices=['sync', 'async'], help='internal: run one side')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            return self.run_mode(options)
+
+        token = self.seed(options)
+        results = {}
+        try:
+            for mode in ('sync', 'async'):
+                env = dict(os.environ, LITTLELEMON_ASYNC_VIEWS='1' if mode == 'async' else '0', BENCH_TOKEN=token)
+                argv = [sys.argv[0], 'bench_asgi', '--mode', mode] + [
+                    f'--{name}={options[name]}' for name in ('requests', 'concurrency', 'threads')
+                ]
+                output = subprocess.run([sys.executable] + argv, env=env, check=True, capture_output=True, text=True).stdout
+                results[mode] = json.loads(output)
+        finally:
+            self.cleanup()
+
+        self.stdout.write(f'{"endpoint":<32}{"mode":<7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}')
+        for path in results['sync']:
+            for mode in ('sync', 'async'):
+                row = results[mode][path]
+                self.stdout.write(f'{path:<32}{mode:<7}{row["rps"]:>9.0f}{row["p50"]:>9.1f}{row["p95"]:>9.1f}')
+
+    def seed(self, options):
+        self.cleanup()
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'{PREFIX} {i}', price=Decimal(i % 40 + 1), inventory=100)
+            for i in range(options['menu_items'])
+        ])
+        items = list(MenuItem.objects.filter(title__startswith=PREFIX)[:5])
+        user = User.objects.create_user(f'{PREFIX}@example.com', PREFIX)
+        orders = Order.objects.bulk_create([Order(user=user, total=Decimal('10.00')) for _ in range(options['orders'])])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for order in orders for item in items[:2]
+        ])
+        CartItem.objects.bulk_create([
+            CartItem(user=user, menuitem=item, quantity=1, unit_price=item.price, price=item.price) for item in items
+        ])
+        return Token.objects.create(user=user).key
+
+    def cleanup(self):
+        # The generated users take their orders with them; the rollups are rebuilt from what is left
+        with transaction.atomic():
+            purge(User.objects.filter(email__startswith=PREFIX), MenuItem.objects.filter(title__startswith=PREFIX))
+            rebuild(Order.objects.all())
+
+    def run_mode(self, options):
+        # Same limits would throttle the benchmark itself
+        SimpleRateThrottle.THROTTLE_RATES = dict.fromkeys(SimpleRateThrottle.THROTTLE_RATES)
+        settings.ALLOWED_HOSTS = ['testserver']
+        assert settings.ASYNC_READ_VIEWS == (options['mode'] == 'async')
+        user = User.objects.get(email=f'{PREFIX}@example.com')
+        order_id = Order.objects.filter(user=user).values_list('id', flat=True).first()
+        menuitem_id = MenuItem.objects.filter(title__startswith=PREFIX).values_list('id', flat=True).first()
+        paths = [
+            '/api/menu-items?page_size=50', f'/api/menu-items/{menuitem_id}', '/api/cart/menu-items',
+            '/api/orders?page_size=20', f'/api/orders/{order_id}',
+        ]
+        headers = {'Authorization': f'Token {os.environ["BENCH_TOKEN"]}'}
+        results = {}
+        for path in paths:
+            if options['mode'] == 'sync':
+                latencies, wall = self.run_sync(path, headers, options)
+            else:
+                latencies, wall = asyncio.run(self.run_async(path, headers, options))
+            latencies.sort()
+            results[path] = {
+                'rps': len(latencies) / wall,
+                'p50': statistics.median(latencies) * 1000,
+                'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            }
+        self.stdout.write(json.dumps(results))
+
+    def run_sync(self, path, headers, options):
+        def one(_):
+            start = time.perf_counter()
+            response = Client(headers=headers).get(path)
+            assert response.status_code == 200, response.content
+            return time.perf_counter() - start
+
+        def worker(chunk):
+            try:
+                return [one(i) for i in chunk]
+            finally:
+                connections.close_all()
+
+        chunks = [range(i, options['requests'], options['threads']) for i in range(options['threads'])]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as pool:
+            latencies = [t for part in pool.map(worker, chunks) for t in part]
+        return latencies, time.perf_counter() - started
+
+    async def run_async(self, path, headers, options):
+        client = AsyncClient()
+        gate = asyncio.Semaphore(options['concurrency'])
+
+        async def one():
+            async with gate:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.content
+                return time.perf_counter() - start
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*[one() for _ in range(options['requests'])])
+        return list(latencies), time.perf_counter() - started
@@ -0,0 +1,98 @@
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from littlelemon.models import CartItem, MenuItem, Order, OrderItem, User
+from littlelemon.rollups import purge, rebuild
+from littlelemon.views import OrdersView
+
+PREFIX = 'bench-checkout'
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrent checkout benchmark: parallel customers fill carts and POST /api/orders '
+        'against a shared, limited stock. Run against a scratch database, e.g. '
+        'LITTLELEMON_DB=/tmp/bench.sqlite3 python manage.py migrate && '
+        'LITTLELEMON_DB=/tmp/bench.sqlite3 python manage.py bench_checkout'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=8, help='parallel customers (threads)')
+        parser.add_argument('--checkouts', type=int, default=25, help='checkouts per customer')
+        parser.add_argument('--items', type=int, default=5, help='menu items (= lines per cart)')
+        parser.add_argument('--stock', type=int, default=500, help='starting inventory per menu item')
+        parser.add_argument('--keep', action='store_true', help='keep the generated rows')
+
+    def handle(self, *args, **options):
+        self.cleanup()
+        items = MenuItem.objects.bulk_create([
+            MenuItem(title=f'{PREFIX} {i}', price=Decimal('5.00'), inventory=options['stock'])
+            for i in range(options['items'])
+        ])
+        customers = [
+            User.objects.create_user(f'{PREFIX}-{i}@example.com', f'{PREFIX} {i}')
+            for i in range(options['customers'])
+        ]
+
+        view = OrdersView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(len(customers))
+        latencies, outcomes = [], {}
+        lock = threading.Lock()
+
+        def customer_loop(user):
+            barrier.wait()
+            try:
+                for _ in range(options['checkouts']):
+                    CartItem.objects.bulk_create([
+                        CartItem(user=user, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+                        for item in items
+                    ], ignore_conflicts=True)
+                    request = factory.post('/api/orders')
+                    force_authenticate(request, user=user)
+                    start = time.perf_counter()
+                    try:
+                        outcome = view(request).status_code
+                    except Exception as e:  # e.g. OperationalError: database is locked
+                        outcome = type(e).__name__
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=customer_loop, args=(user,)) for user in customers]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        sold = sum(OrderItem.objects.filter(menuitem__in=items).values_list('quantity', flat=True))
+        remaining = sum(MenuItem.objects.filter(pk__in=[i.pk for i in items]).values_list('inventory', flat=True))
+        latencies.sort()
+        self.stdout.write(f'checkouts: {len(latencies)} in {wall:.2f}s ({len(latencies) / wall:.1f}/s)')
+        self.stdout.write(f'outcomes:  {outcomes}')
+        self.stdout.write(
+            f'latency:   p50 {statistics.median(latencies) * 1000:.1f}ms  '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms  max {latencies[-1] * 1000:.1f}ms'
+        )
+        consistent = sold + remaining == options['stock'] * len(items)
+        self.stdout.write(f'stock:     sold {sold}, remaining {remaining}, consistent: {consistent}')
+
+        if not options['keep']:
+            self.cleanup()
+
+    def cleanup(self):
+        # The generated users take their orders with them; the rollups are rebuilt from what is left
+        with transaction.atomic():
+            purge(User.objects.filter(email__startswith=PREFIX), MenuItem.objects.filter(title__startswith=PREFIX))
+            rebuild(Order.objects.all())
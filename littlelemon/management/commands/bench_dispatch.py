@@ -0,0 +1,86 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from littlelemon.dispatch import crew_loads, dispatch
+from littlelemon.models import MenuItem, Order, User
+from littlelemon.roles import DELIVERY_CREW, MANAGER
+from littlelemon.rollups import purge, rebuild
+from littlelemon.views import SingleOrderView
+
+PREFIX = 'bench-dispatch'
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispatch benchmark: assign tens of thousands of unassigned orders with the dispatch engine, '
+        'against a sample assigned one manager PATCH at a time. Use a scratch database: '
+        'LITTLELEMON_DB=/tmp/bench.sqlite3 python manage.py bench_dispatch'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--crew', type=int, default=40)
+        parser.add_argument('--manual', type=int, default=300, help='orders assigned by PATCH for comparison')
+        parser.add_argument('--keep', action='store_true', help='keep the generated rows')
+
+    def handle(self, *args, **options):
+        self.cleanup()
+        manager, crew = self.seed(options)
+        try:
+            manual = self.manual(manager, crew, options['manual'])
+            self.stdout.write(f'manual PATCH:  {options["manual"]} orders in {manual:.2f}s '
+                              f'({options["manual"] / manual:.0f} orders/s)')
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                # Only the generated orders and crew: real unassigned orders are left alone
+                result = dispatch(orders=Order.objects.filter(user__email__startswith=PREFIX),
+                                  crew=User.objects.filter(email__startswith=PREFIX))
+                elapsed = time.perf_counter() - started
+            self.stdout.write(f'dispatch:      {result["assigned"]} orders in {elapsed:.2f}s '
+                              f'({result["assigned"] / elapsed:.0f} orders/s, {len(queries)} queries)')
+
+            loads = list(crew_loads(crew).values())
+            self.stdout.write(f'open deliveries per crew member: min {min(loads)}, max {max(loads)}')
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def seed(self, options):
+        manager = User.objects.create_user(f'{PREFIX}-manager@example.com', PREFIX)
+        manager.groups.add(Group.objects.get_or_create(name=MANAGER)[0])
+        crew = User.objects.bulk_create([
+            User(email=f'{PREFIX}-crew-{i}@example.com', name=PREFIX) for i in range(options['crew'])
+        ])
+        Group.objects.get_or_create(name=DELIVERY_CREW)[0].user_set.add(*crew)
+        customer = User.objects.create_user(f'{PREFIX}-customer@example.com', PREFIX)
+        Order.objects.bulk_create(
+            [Order(user=customer, total=Decimal('10.00')) for _ in range(options['orders'])], batch_size=5000)
+        return manager, [user.pk for user in crew]
+
+    def manual(self, manager, crew, count):
+        # What a manager does today: one PATCH per order, picking crew round-robin
+        view = SingleOrderView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        order_ids = Order.objects.filter(user__email__startswith=PREFIX, delivery_crew__isnull=True) \
+            .order_by('date', 'id').values_list('id', flat=True)[:count]
+        started = time.perf_counter()
+        for n, order_id in enumerate(order_ids):
+            request = factory.patch(f'/api/orders/{order_id}', {'delivery_crew': crew[n % len(crew)]}, format='json')
+            force_authenticate(request, user=manager)
+            response = view(request, pk=order_id)
+            if response.status_code != 200:
+                raise CommandError(f'PATCH /api/orders/{order_id} returned {response.status_code}: {response.data}')
+        return time.perf_counter() - started
+
+    def cleanup(self):
+        # The generated users take their orders with them; the rollups are rebuilt from what is left
+        with transaction.atomic():
+            purge(User.objects.filter(email__startswith=PREFIX), MenuItem.objects.none())
+            rebuild(Order.objects.all())
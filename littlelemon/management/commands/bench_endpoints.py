@@ -0,0 +1,330 @@
+import contextlib
+import json
+import platform
+import subprocess
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import SimpleRateThrottle
+
+from littlelemon import urls
+from littlelemon.models import CartItem, MenuItem, Order, User
+from littlelemon.roles import DELIVERY_CREW, MANAGER
+from littlelemon.rollups import purge, rebuild
+
+from .seed_data import PREFIX as SEED_PREFIX
+
+PREFIX = 'bench-endpoints'
+
+# Routes with nothing to time request by request
+SKIPPED = {
+    'orders/events': 'long-lived server-sent event stream (ASGI only)',
+}
+
+
+@dataclass
+class Scenario:
+    route: str           # the urls.py pattern it exercises
+    method: str
+    path: str            # '{name}' parts come from the context's ids and the setup's return value
+    user: str            # 'manager', 'crew', 'customer' or 'writer' (the runner's own customer)
+    body: object = None   # JSON-encoded unless a str, which is sent as is
+    setup: object = None  # callable(context) run untimed before each request; may return path kwargs
+    status: int = 200
+    label: str = ''       # tells apart scenarios with the same method and path
+    content_type: str = 'application/json'
+
+    @property
+    def name(self):
+        return ' '.join(filter(None, [self.method, self.path, self.label]))
+
+
+def percentile(values, p):
+    # Nearest rank on sorted `values`
+    return values[max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))]
+
+
+class QueryCounter:
+    # execute_wrapper on every connection: counts statements without DEBUG's query log
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextlib.contextmanager
+    def installed(self):
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every route in littlelemon/urls.py through the Django test client against '
+        'the seed_data dataset: p50/p95/p99 latency, throughput and SQL queries per request, '
+        'optionally saved as JSON and compared with an earlier run. Use a scratch database: '
+        'LITTLELEMON_DB=/tmp/bench.sqlite3 python manage.py seed_data && '
+        'LITTLELEMON_DB=/tmp/bench.sqlite3 python manage.py bench_endpoints --output before.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='untimed requests per endpoint first')
+        parser.add_argument('--only', action='append', default=[], help='run endpoints whose name contains this')
+        parser.add_argument('--output', help='write the results to this JSON file')
+        parser.add_argument('--compare', help='print the change against this earlier JSON file')
+
+    def handle(self, *args, **options):
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        baseline = self.load(options['compare']) if options['compare'] else None
+        context = self.prepare()
+        scenarios = self.scenarios(context)
+        # Rate limits would throttle the benchmark itself
+        rates, SimpleRateThrottle.THROTTLE_RATES = (
+            SimpleRateThrottle.THROTTLE_RATES, dict.fromkeys(SimpleRateThrottle.THROTTLE_RATES))
+        try:
+            endpoints = {
+                scenario.name: self.run(scenario, context, options) for scenario in scenarios
+                if not options['only'] or any(only in scenario.name for only in options['only'])
+            }
+        finally:
+            SimpleRateThrottle.THROTTLE_RATES = rates
+            self.cleanup()
+
+        not_covered = {str(p.pattern) for p in urls.urlpatterns} - set(SKIPPED) - {s.route for s in scenarios}
+        results = {'meta': self.meta(options, sorted(not_covered)), 'endpoints': endpoints}
+        self.report(results, baseline)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(f'Saved to {options["output"]}')
+
+    # Data
+
+    def prepare(self):
+        seeded = User.objects.filter(email__startswith=f'{SEED_PREFIX}-')
+        manager = seeded.filter(groups__name=MANAGER).order_by('id').first()
+        crew = seeded.filter(groups__name=DELIVERY_CREW, deliveries__isnull=False).order_by('id').first()
+        order = Order.objects.filter(user__in=seeded).order_by('-id').first()
+        if manager is None or crew is None or order is None:
+            raise CommandError('No seeded dataset: run `manage.py seed_data` first.')
+
+        self.cleanup()
+        writer = User.objects.create_user(f'{PREFIX}-writer@example.com', f'{PREFIX} writer')
+        target = User.objects.create_user(f'{PREFIX}-target@example.com', f'{PREFIX} target')
+        items = MenuItem.objects.bulk_create([
+            MenuItem(title=f'{PREFIX} {i}', price=Decimal('4.50'), inventory=10 ** 9) for i in range(3)
+        ])
+        users = {'manager': manager, 'crew': crew, 'customer': order.user, 'writer': writer}
+        bulk_ids = [o.id for o in Order.objects.bulk_create([Order(user=writer) for _ in range(100)])]
+        return {
+            'clients': {
+                role: Client(headers={'Authorization': f'Token {Token.objects.get_or_create(user=user)[0].key}'})
+                for role, user in users.items()
+            },
+            'users': users,
+            'target': target,
+            'items': items,
+            'bulk_ids': bulk_ids,
+            'ids': {
+                'menuitem': MenuItem.objects.filter(title__startswith=f'{SEED_PREFIX} ').order_by('id').first().pk,
+                'item': items[0].pk,
+                'target': target.pk,
+                'order': order.pk,
+                'crew_order': Order.objects.filter(delivery_crew=crew).order_by('-id').first().pk,
+                'assigned': Order.objects.create(user=writer, delivery_crew=crew).pk,
+                'bulk_order': bulk_ids[0],
+            },
+        }
+
+    def cleanup(self):
+        # The runner's users take their orders and carts with them; rollups follow from the orders
+        with transaction.atomic():
+            purge(User.objects.filter(email__startswith=f'{PREFIX}-'), MenuItem.objects.filter(title__startswith=f'{PREFIX} '))
+            rebuild(Order.objects.all())
+
+    def scenarios(self, c):
+        items, writer, crew = c['items'], c['users']['writer'], c['users']['crew']
+
+        def fill_cart(c):
+            CartItem.objects.bulk_create([
+                CartItem(user=writer, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+                for item in items
+            ], ignore_conflicts=True)
+
+        def drop_created_item(c):
+            MenuItem.objects.filter(title=f'{PREFIX} created').delete()
+
+        def new_menu_item(c):
+            return {'pk': MenuItem.objects.create(title=f'{PREFIX} deleted', price=1, inventory=1).pk}
+
+        def new_order(c):
+            return {'pk': Order.objects.create(user=writer).pk}
+
+        def join_group(name):
+            return lambda c: c['target'].groups.add(Group.objects.get(name=name))
+
+        def last_day(c):
+            return {'since': (datetime.now(timezone.utc) - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')}
+
+        def old_unassigned_orders(c):
+            # Older than any seeded order, so dispatch takes these first
+            ids = [o.id for o in Order.objects.bulk_create([Order(user=writer) for _ in range(20)])]
+            Order.objects.filter(id__in=ids).update(date=datetime(2000, 1, 1, tzinfo=timezone.utc))
+
+        target, item = c['ids']['target'], c['ids']['item']
+        csv_import = 'title,price,inventory\n' + ''.join(f'{PREFIX} import {i},2.00,100\n' for i in range(100))
+        return [
+            Scenario('menu-items', 'GET', '/api/menu-items', 'customer'),
+            Scenario('menu-items', 'GET', '/api/menu-items?ordering=-price&page_size=50', 'customer'),
+            Scenario('menu-items', 'GET', f'/api/menu-items?search={SEED_PREFIX}%201', 'customer'),
+            Scenario('menu-items', 'POST', '/api/menu-items', 'manager',
+                     {'title': f'{PREFIX} created', 'price': '3.00', 'inventory': 10},
+                     setup=drop_created_item, status=201),
+            Scenario('menu-items/<int:pk>', 'GET', '/api/menu-items/{menuitem}', 'customer'),
+            Scenario('menu-items/<int:pk>', 'PUT', '/api/menu-items/{item}', 'manager',
+                     {'title': f'{PREFIX} 0', 'price': '4.50', 'inventory': 10 ** 9}),
+            Scenario('menu-items/<int:pk>', 'PATCH', '/api/menu-items/{item}', 'manager', {'price': '4.50'}),
+            Scenario('menu-items/<int:pk>', 'DELETE', '/api/menu-items/{pk}', 'manager', setup=new_menu_item),
+            Scenario('menu-items/bulk', 'GET', '/api/menu-items/bulk?format=csv', 'manager'),
+            Scenario('menu-items/bulk', 'GET', '/api/menu-items/bulk?format=ndjson', 'manager'),
+            Scenario('menu-items/bulk', 'POST', '/api/menu-items/bulk', 'manager', csv_import,
+                     label='(100 rows)', content_type='text/csv'),
+            Scenario('groups/manager/users', 'GET', '/api/groups/manager/users', 'manager'),
+            Scenario('groups/manager/users', 'POST', '/api/groups/manager/users', 'manager',
+                     {'user_id': target}, status=201),
+            Scenario('groups/manager/users/<int:user_id>', 'DELETE', '/api/groups/manager/users/{target}',
+                     'manager', setup=join_group(MANAGER)),
+            Scenario('groups/delivery-crew/users', 'GET', '/api/groups/delivery-crew/users', 'manager'),
+            Scenario('groups/delivery-crew/users', 'POST', '/api/groups/delivery-crew/users', 'manager',
+                     {'user_id': target}, status=201),
+            Scenario('groups/delivery-crew/users/<int:user_id>', 'DELETE',
+                     '/api/groups/delivery-crew/users/{target}', 'manager', setup=join_group(DELIVERY_CREW)),
+            Scenario('cart/menu-items', 'GET', '/api/cart/menu-items', 'writer', setup=fill_cart),
+            Scenario('cart/menu-items', 'POST', '/api/cart/menu-items', 'writer',
+                     {'menuitem_id': item, 'quantity': 1}, status=201),
+            Scenario('cart/menu-items', 'POST', '/api/cart/menu-items', 'writer',
+                     {'items': [{'menuitem_id': i.pk, 'quantity': 1} for i in items]}, status=201, label='(items)'),
+            Scenario('cart/menu-items', 'DELETE', '/api/cart/menu-items', 'writer', setup=fill_cart),
+            Scenario('orders', 'GET', '/api/orders', 'customer'),
+            Scenario('orders', 'GET', '/api/orders?status=0', 'crew'),
+            Scenario('orders', 'GET', '/api/orders?page_size=50', 'manager'),
+            Scenario('orders', 'GET', '/api/orders?fields=id,status,total', 'manager'),
+            Scenario('orders', 'POST', '/api/orders', 'writer', setup=fill_cart, status=201),
+            Scenario('orders/<int:pk>', 'GET', '/api/orders/{order}', 'customer'),
+            Scenario('orders/<int:pk>', 'GET', '/api/orders/{crew_order}', 'crew'),
+            Scenario('orders/<int:pk>', 'PATCH', '/api/orders/{assigned}', 'crew', {'status': 1}),
+            Scenario('orders/<int:pk>', 'PUT', '/api/orders/{bulk_order}', 'manager',
+                     {'delivery_crew': crew.pk, 'status': 0}),
+            Scenario('orders/<int:pk>', 'PATCH', '/api/orders/{bulk_order}', 'manager', {'status': 0}),
+            Scenario('orders/<int:pk>', 'DELETE', '/api/orders/{pk}', 'manager', setup=new_order),
+            Scenario('orders/bulk', 'PATCH', '/api/orders/bulk', 'manager',
+                     {'ids': c['bulk_ids'], 'status': 0, 'delivery_crew': crew.pk}),
+            Scenario('orders/export', 'GET', '/api/orders/export?format=csv&date_after={since}', 'manager',
+                     setup=last_day, label='(last day)'),
+            Scenario('orders/export', 'GET', '/api/orders/export?format=ndjson&date_after={since}', 'manager',
+                     setup=last_day, label='(last day)'),
+            Scenario('orders/dispatch', 'POST', '/api/orders/dispatch', 'manager',
+                     {'limit': 20}, setup=old_unassigned_orders),
+            Scenario('reports/daily-revenue', 'GET', '/api/reports/daily-revenue', 'manager'),
+            Scenario('reports/menu-items', 'GET', '/api/reports/menu-items', 'manager'),
+            Scenario('reports/delivery-crew', 'GET', '/api/reports/delivery-crew', 'manager'),
+            Scenario('metrics', 'GET', '/api/metrics', 'manager'),
+        ]
+
+    # Measurement
+
+    def run(self, scenario, context, options):
+        client = context['clients'][scenario.user]
+        body = scenario.body
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+        latencies, queries, errors = [], [], []
+        for i in range(options['warmup'] + options['requests']):
+            kwargs = scenario.setup(context) if scenario.setup else None
+            path = scenario.path.format(**context['ids'], **kwargs or {})
+            with QueryCounter().installed() as counter:
+                start = time.perf_counter()
+                response = client.generic(scenario.method, path, body or '', content_type=scenario.content_type)
+                if response.streaming:
+                    b''.join(response.streaming_content)  # exports run their queries as they stream
+                elapsed = time.perf_counter() - start
+            if response.status_code != scenario.status and not errors:
+                errors.append(f'{response.status_code}: {response.content[:200].decode(errors="replace")}')
+            if i >= options['warmup']:
+                latencies.append(elapsed)
+                queries.append(counter.count)
+        latencies.sort()
+        return {
+            'route': scenario.route,
+            'user': scenario.user,
+            'requests': len(latencies),
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'rps': len(latencies) / sum(latencies),
+            'queries': sum(queries) / len(queries),
+            'max_queries': max(queries),
+            'error': errors[0] if errors else None,
+        }
+
+    def meta(self, options, not_covered):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, cwd=settings.BASE_DIR).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'commit': commit,
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'requests': options['requests'],
+            'dataset': {
+                'users': User.objects.count(),
+                'menu_items': MenuItem.objects.count(),
+                'cart_items': CartItem.objects.count(),
+                'orders': Order.objects.count(),
+            },
+            'skipped': SKIPPED,
+            'not_covered': not_covered,
+        }
+
+    def load(self, path):
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+    def report(self, results, baseline):
+        before = baseline['endpoints'] if baseline else {}
+        self.stdout.write(f'{"endpoint":<58}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"queries":>9}')
+        for name, row in results['endpoints'].items():
+            line = (f'{name:<58}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}{row["p99_ms"]:>9.2f}'
+                    f'{row["rps"]:>9.0f}{row["queries"]:>9.1f}')
+            if name in before:
+                old = before[name]
+                line += f'   p50 {(row["p50_ms"] / old["p50_ms"] - 1) * 100:+.0f}%  queries {row["queries"] - old["queries"]:+.1f}'
+            if row['error']:
+                line += f'   unexpected {row["error"]}'
+            self.stdout.write(line)
+        if baseline:
+            self.stdout.write(f'compared with {baseline["meta"].get("commit")} ({baseline["meta"].get("time")})')
+        for route, reason in results['meta']['skipped'].items():
+            self.stdout.write(f'skipped {route}: {reason}')
+        for route in results['meta']['not_covered']:
+            self.stdout.write(self.style.WARNING(f'no scenario for {route}'))
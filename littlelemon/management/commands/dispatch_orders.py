@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from littlelemon.dispatch import dispatch
+
+
+class Command(BaseCommand):
+    help = (
+        'Assign unassigned orders to the least-loaded delivery crew members. '
+        'With --interval, keep dispatching new orders until interrupted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='orders per run (default: all unassigned)')
+        parser.add_argument('--capacity', type=int, help='max open deliveries per crew member')
+        parser.add_argument('--interval', type=float, help='repeat every N seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            result = dispatch(limit=options['limit'], capacity=options['capacity'])
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f'Assigned {result["assigned"]} orders to {len(result["crew"])} crew members in {elapsed:.0f}ms'
+                + (f'; {result["unassigned"]} left (crew at capacity)' if result['unassigned'] else '')
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
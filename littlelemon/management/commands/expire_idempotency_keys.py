@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from littlelemon.idempotency import expire_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete Idempotency-Key records older than IDEMPOTENCY_TTL. Every new key does this too; '
+        'run it from cron to also clean up while no keyed requests arrive.'
+    )
+
+    def handle(self, *args, **options):
+        count = expire_keys()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired idempotency keys.'))
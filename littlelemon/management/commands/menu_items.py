@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from littlelemon import menu_bulk
+
+FORMATS = {'csv': menu_bulk.csv_rows, 'ndjson': menu_bulk.ndjson_rows}
+
+
+class Command(BaseCommand):
+    help = (
+        'Import menu items from a CSV (title,price,inventory header) or NDJSON file, updating '
+        'existing items by title, or export every item. The format defaults to the file extension.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['import', 'export'])
+        parser.add_argument('path', nargs='?', help='file to import, or export to (default: stdout)')
+        parser.add_argument('--format', choices=sorted(FORMATS))
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path or '')[1].lstrip('.').lower() or 'csv'
+        if file_format not in FORMATS:
+            raise CommandError(f'Unknown format "{file_format}"; pass --format csv or --format ndjson.')
+        if options['action'] == 'export':
+            self.export(path, file_format)
+        elif not path:
+            raise CommandError('import needs the path of a file.')
+        else:
+            self.import_file(path, file_format)
+
+    def export(self, path, file_format):
+        if not path:
+            for line in menu_bulk.export_lines(file_format):
+                self.stdout.write(line, ending='')
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as out:
+            out.writelines(menu_bulk.export_lines(file_format))
+        self.stderr.write(f'Exported the menu to {path}.')
+
+    def import_file(self, path, file_format):
+        with open(path, 'rb') as lines:
+            try:
+                summary = menu_bulk.import_rows(FORMATS[file_format](lines))
+            except menu_bulk.ImportFailed as e:
+                for error in e.errors:
+                    self.stderr.write(f'line {error["line"]}: {error["errors"]}')
+                raise CommandError('Nothing was imported.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {summary["rows"]} rows: {summary["created"]} created, {summary["updated"]} updated.'))
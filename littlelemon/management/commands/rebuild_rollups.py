@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from littlelemon.models import Order
+from littlelemon.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the sales rollups (daily revenue, menu item sales, deliveries) from all orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='orders read per query')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild(Order.objects.all(), chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups from {count} orders.'))
@@ -0,0 +1,137 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from littlelemon.cache import bump_menu_version
+from littlelemon.models import CartItem, MenuItem, Order, OrderItem, User
+from littlelemon.roles import DELIVERY_CREW, MANAGER
+from littlelemon.rollups import purge, rebuild
+
+PREFIX = 'seed'
+BATCH = 2000  # rows per bulk INSERT / orders per chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a synthetic dataset for benchmarks: managers, delivery crew, '
+        'customers, menu items, carts, and orders spread over past days. Rows are tagged with '
+        f'"{PREFIX}" and replaced on every run. Use a scratch database, e.g. '
+        'LITTLELEMON_DB=/tmp/bench.sqlite3 python manage.py seed_data --orders 100000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--managers', type=int, default=5)
+        parser.add_argument('--crew', type=int, default=50, help='delivery crew members')
+        parser.add_argument('--customers', type=int, default=2000)
+        parser.add_argument('--menu-items', type=int, default=500)
+        parser.add_argument('--carts', type=int, default=500, help='customers with a filled cart')
+        parser.add_argument('--cart-lines', type=int, default=5, help='lines per cart')
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--order-lines', type=int, default=3, help='lines per order (at most)')
+        parser.add_argument('--days', type=int, default=90, help='spread order dates over this many days')
+        parser.add_argument('--password', default='seed1234', help='password of every seeded user')
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help='only remove the seeded rows')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['random_seed'])
+        with transaction.atomic():
+            self.cleanup()
+            if options['clear']:
+                rebuild(Order.objects.all())
+                self.stdout.write(self.style.SUCCESS('Removed the seeded rows.'))
+                return
+            managers, crew, customers = self.seed_users(options)
+            items = self.seed_menu(rng, options)
+            self.seed_carts(rng, customers[:options['carts']], items, options)
+            orders = self.seed_orders(rng, customers, crew, items, options)
+            rebuild(Order.objects.all())
+        bump_menu_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(managers)} managers, {len(crew)} delivery crew, {len(customers)} customers, '
+            f'{len(items)} menu items, {min(options["carts"], len(customers))} carts and {orders} orders.'
+        ))
+
+    def cleanup(self):
+        # Orders, carts and group memberships go with their users and menu items; rebuild() follows
+        purge(User.objects.filter(email__startswith=f'{PREFIX}-'), MenuItem.objects.filter(title__startswith=f'{PREFIX} '))
+
+    def seed_users(self, options):
+        password = make_password(options['password'])  # hashed once, shared by every seeded user
+        users = {}
+        for role, count in (('manager', options['managers']), ('crew', options['crew']),
+                            ('customer', options['customers'])):
+            User.objects.bulk_create([
+                User(email=f'{PREFIX}-{role}-{i}@example.com', name=f'{PREFIX} {role} {i}', password=password)
+                for i in range(count)
+            ], batch_size=BATCH)
+            users[role] = list(
+                User.objects.filter(email__startswith=f'{PREFIX}-{role}-').order_by('id').values_list('id', flat=True))
+
+        memberships = User.groups.through
+        for role, group_name in (('manager', MANAGER), ('crew', DELIVERY_CREW)):
+            group, _ = Group.objects.get_or_create(name=group_name)
+            memberships.objects.bulk_create(
+                [memberships(user_id=user_id, group_id=group.id) for user_id in users[role]], batch_size=BATCH)
+        return users['manager'], users['crew'], users['customer']
+
+    def seed_menu(self, rng, options):
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'{PREFIX} {i}', price=Decimal(rng.randrange(200, 4000)) / 100, inventory=rng.randrange(1000, 100000))
+            for i in range(options['menu_items'])
+        ], batch_size=BATCH)
+        return list(MenuItem.objects.filter(title__startswith=f'{PREFIX} ').values_list('id', 'price'))
+
+    def seed_carts(self, rng, customers, items, options):
+        lines = min(options['cart_lines'], len(items))
+        CartItem.objects.bulk_create([
+            CartItem(user_id=user_id, menuitem_id=item_id, quantity=quantity,
+                     unit_price=price, price=price * quantity)
+            for user_id in customers
+            for (item_id, price), quantity in ((item, rng.randint(1, 3)) for item in rng.sample(items, lines))
+        ], batch_size=BATCH)
+
+    def seed_orders(self, rng, customers, crew, items, options):
+        """
+        Orders older than today are delivered; today's are a mix of unassigned and out for
+        delivery. Dates are set after the INSERT (date is auto_now_add), one UPDATE per day.
+        """
+        if not customers or not items:
+            return 0
+        days = max(options['days'], 1)
+        per_day = {}
+        created = 0
+        while created < options['orders']:
+            count = min(BATCH, options['orders'] - created)
+            ages = [rng.randrange(days) for _ in range(count)]
+            orders = []
+            for age in ages:
+                crew_id = rng.choice(crew) if crew and (age or rng.random() < 0.5) else None
+                orders.append(Order(user_id=rng.choice(customers), delivery_crew_id=crew_id,
+                                    status=1 if age and crew_id else 0))
+            lines = []
+            for order in orders:
+                for item_id, price in rng.sample(items, rng.randint(1, min(options['order_lines'], len(items)))):
+                    quantity = rng.randint(1, 3)
+                    lines.append((order, OrderItem(menuitem_id=item_id, quantity=quantity,
+                                                   unit_price=price, price=price * quantity)))
+                    order.total += price * quantity
+            Order.objects.bulk_create(orders)
+            for order, line in lines:
+                line.order = order
+            OrderItem.objects.bulk_create([line for _, line in lines], batch_size=BATCH)
+            for order, age in zip(orders, ages):
+                per_day.setdefault(age, []).append(order.id)
+            created += count
+
+        for age, ids in per_day.items():
+            if age:
+                for start in range(0, len(ids), BATCH):
+                    Order.objects.filter(id__in=ids[start:start + BATCH]).update(date=F('date') - timedelta(days=age))
+        return created
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from littlelemon.routers import replicas, sync_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database over every read replica (LITTLELEMON_REPLICAS). '
+        'With --interval, keep copying so the replicas lag the primary by at most that many seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='repeat every N seconds until interrupted')
+
+    def handle(self, *args, **options):
+        if not replicas():
+            raise CommandError('No replicas configured; set LITTLELEMON_REPLICAS.')
+        while True:
+            started = time.perf_counter()
+            sync_replicas()
+            self.stdout.write(f'Synced {", ".join(replicas())} in {(time.perf_counter() - started) * 1000:.0f}ms')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
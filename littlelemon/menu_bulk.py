@@ -0,0 +1,130 @@
+"""
+Bulk menu import and export: /api/menu-items/bulk and `manage.py menu_items`.
+
+Imports read CSV (with a header row) or NDJSON one line at a time, validate STREAM_CHUNK_SIZE
+rows at once with MenuItemImportSerializer and upsert each chunk by title with one
+INSERT ... ON CONFLICT (title) DO UPDATE per batch, so memory stays flat whatever the file
+size. The whole file is read and validated before the transaction opens (valid chunks wait in
+a SpooledTemporaryFile), so a slow upload never holds the database's write lock. If any row is
+invalid nothing is written, and up to MAX_ERRORS rows are reported with their line numbers.
+Exports stream the catalogue in id order.
+"""
+import codecs
+import csv
+import itertools
+import json
+import pickle
+import tempfile
+
+from django.db import transaction
+
+from .cache import bump_menu_version
+from .models import MenuItem
+from .serializers import MenuItemImportSerializer
+from .streaming import STREAM_CHUNK_SIZE, acsv_lines, andjson_lines, csv_lines, ndjson_lines
+
+FIELDS = ['id', 'title', 'price', 'inventory']  # export columns; imports ignore id
+MAX_ERRORS = 100
+SPOOL_MAX_SIZE = 4 * 1024 * 1024  # bytes of validated rows held in memory before spilling to disk
+
+
+class ImportFailed(Exception):
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid rows')
+        self.errors = errors  # [{'line': n, 'errors': {...}}, ...]
+
+
+def csv_rows(lines):
+    # (line number, dict) per record of an iterable of byte lines; the header names the columns
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def ndjson_rows(lines):
+    # (line number, value) per non-blank line; None for a line that is not JSON
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def upsert(rows):
+    # One chunk of validated rows; returns (created, updated)
+    by_title = {row['title']: row for row in rows}  # a title repeated in the chunk: the last row wins
+    existing = set(MenuItem.objects.filter(title__in=by_title).values_list('title', flat=True))
+    MenuItem.objects.bulk_create(
+        [MenuItem(**row) for row in by_title.values()],
+        update_conflicts=True,
+        unique_fields=['title'],
+        update_fields=['price', 'inventory'],
+    )
+    return len(by_title) - len(existing), len(existing)
+
+
+def _validate(rows, spool):
+    # Validate every row, pickling each valid chunk into `spool`; returns the number of chunks
+    chunks = 0
+    errors = []
+    try:
+        rows = iter(rows)
+        while chunk := list(itertools.islice(rows, STREAM_CHUNK_SIZE)):
+            valid = []
+            for number, row in chunk:
+                if not isinstance(row, dict):
+                    errors.append({'line': number, 'errors': {'non_field_errors': ['Expected a JSON object.']}})
+                else:
+                    valid.append((number, row))
+            serializer = MenuItemImportSerializer(data=[row for _, row in valid], many=True)
+            if not serializer.is_valid():
+                failed = serializer.errors  # {index: errors} in recent DRF, one entry per row before
+                failed = failed.items() if isinstance(failed, dict) else enumerate(failed)
+                errors += [{'line': valid[i][0], 'errors': e} for i, e in failed if e]
+            if len(errors) >= MAX_ERRORS:
+                break
+            if errors:
+                continue  # keep validating to report more, but keep nothing
+            pickle.dump([dict(row) for row in serializer.validated_data], spool)
+            chunks += 1
+    except UnicodeDecodeError:
+        raise ImportFailed([{'line': None, 'errors': {'non_field_errors': ['The file is not UTF-8.']}}])
+    if errors:
+        raise ImportFailed(sorted(errors, key=lambda e: e['line'])[:MAX_ERRORS])
+    return chunks
+
+
+def import_rows(rows):
+    """
+    Validate and upsert (line number, row) pairs. Returns {'rows', 'created', 'updated'};
+    raises ImportFailed (and writes nothing) if any row is invalid.
+    """
+    summary = {'rows': 0, 'created': 0, 'updated': 0}
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        chunks = _validate(rows, spool)
+        spool.seek(0)
+        with transaction.atomic():
+            for _ in range(chunks):
+                chunk = pickle.load(spool)
+                created, updated = upsert(chunk)
+                summary['rows'] += len(chunk)
+                summary['created'] += created
+                summary['updated'] += updated
+            bump_menu_version()  # bulk_create sends no post_save
+    return summary
+
+
+def export_lines(file_format, asynchronous=False):
+    # 'csv' or 'ndjson' lines for the whole catalogue; asynchronous for ASGI responses
+    queryset = MenuItem.objects.order_by('id')
+    if file_format == 'csv':
+        rows = queryset.values_list(*FIELDS)
+        if asynchronous:
+            return acsv_lines(FIELDS, rows.aiterator(chunk_size=STREAM_CHUNK_SIZE))
+        return csv_lines(FIELDS, rows.iterator(chunk_size=STREAM_CHUNK_SIZE))
+    rows = queryset.values(*FIELDS)
+    if asynchronous:
+        return andjson_lines(rows.aiterator(chunk_size=STREAM_CHUNK_SIZE))
+    return ndjson_lines(rows.iterator(chunk_size=STREAM_CHUNK_SIZE))
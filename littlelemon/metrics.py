@@ -0,0 +1,209 @@
+"""
+Per-request timings (RequestMetricsMiddleware) and their in-process histograms.
+
+Each request gets a Timings in a context variable. SQL is timed by an execute wrapper that
+every database connection carries from creation (signals.install_sql_timer), serializing by
+TimedRepresentationMixin, the fast list rows and FastJSONRenderer. The totals go out as a
+Server-Timing header and into fixed-bucket histograms per view and method, exposed in
+Prometheus text format by GET /api/metrics. Histograms are per process: scrape every worker.
+
+Views declare `query_budget = {'GET': n, ...}`: the most queries a request to them may run,
+whatever the data size. With ENFORCE_QUERY_BUDGETS (DEBUG and tests) the statements are
+kept and a request over budget raises QueryBudgetExceeded listing them.
+
+A streaming response is measured until its body is sent: queries run while streaming count
+towards the view's numbers and budget, which is checked once the stream ends, and it gets no
+Server-Timing header (sent before those are known). Views with open-ended streams (server-sent
+events) set `measure_stream = False` and are measured up to the start of the stream.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class Timings:
+    __slots__ = ('start', 'queries', 'sql', 'serialize', 'statements', '_depth', '_serialize_start', '_serialize_sql')
+
+    def __init__(self, keep_statements=False):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.serialize = 0.0
+        self.statements = [] if keep_statements else None
+        self._depth = 0
+
+
+def start(keep_statements=False):
+    # Returns the reset token for finish()
+    return _current.set(Timings(keep_statements))
+
+
+def finish(token):
+    timings = _current.get()
+    _current.reset(token)
+    return timings, time.perf_counter() - timings.start
+
+
+@contextmanager
+def resumed(timings):
+    # Count work done after the view returned (a streaming body) in that request's timings
+    token = _current.set(timings)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def sql_timer(execute, sql, params, many, context):
+    # Connection execute wrapper: one context variable lookup when no request is being timed
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql += time.perf_counter() - started
+        timings.queries += 1
+        if timings.statements is not None:
+            timings.statements.append(sql)
+
+
+@contextmanager
+def serializing():
+    """
+    Time building and encoding the response body. Nested uses count once, and queries run
+    inside (lazy relations) count as SQL, not serializing.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    if timings._depth == 0:
+        timings._serialize_start, timings._serialize_sql = time.perf_counter(), timings.sql
+    timings._depth += 1
+    try:
+        yield
+    finally:
+        timings._depth -= 1
+        if timings._depth == 0:
+            elapsed = time.perf_counter() - timings._serialize_start
+            timings.serialize += elapsed - (timings.sql - timings._serialize_sql)
+
+
+class TimedRepresentationMixin:
+    # Serializer mixin: to_representation counts as serializing
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
+
+
+def server_timing(timings, total):
+    return (
+        f'db;dur={timings.sql * 1000:.2f};desc="{timings.queries} queries", '
+        f'serialize;dur={timings.serialize * 1000:.2f}, total;dur={total * 1000:.2f}'
+    )
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+HISTOGRAMS = (
+    # name, help, buckets, Timings -> value
+    ('http_request_duration_seconds', 'Request latency, first middleware to response (its last chunk when streamed).', LATENCY_BUCKETS, None),
+    ('http_request_db_seconds', 'SQL time per request.', LATENCY_BUCKETS, lambda t: t.sql),
+    ('http_request_db_queries', 'SQL queries per request.', QUERY_BUCKETS, lambda t: t.queries),
+    ('http_request_serialize_seconds', 'Serializer and rendering time per request.', LATENCY_BUCKETS,
+     lambda t: t.serialize),
+)
+
+
+# Method labels: anything else a client sends is counted as "other", so made-up methods
+# cannot add series without bound
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'})
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}  # (view, method) -> [Histogram per HISTOGRAMS entry]
+
+    def observe(self, view, method, timings, total):
+        method = method if method in HTTP_METHODS else 'other'
+        with self.lock:
+            series = self.series.get((view, method))
+            if series is None:
+                series = self.series[(view, method)] = [Histogram(buckets) for _, _, buckets, _ in HISTOGRAMS]
+            for histogram, (_, _, _, value) in zip(series, HISTOGRAMS):
+                histogram.observe(total if value is None else value(timings))
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def exposition(self):
+        # Prometheus text format 0.0.4
+        with self.lock:
+            series = {key: [(list(h.counts), h.sum) for h in histograms] for key, histograms in self.series.items()}
+        lines = []
+        for i, (name, help_text, buckets, _) in enumerate(HISTOGRAMS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (view, method), histograms in sorted(series.items()):
+                counts, total = histograms[i]
+                labels = f'view="{_escape(view)}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip([*buckets, '+Inf'], counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {total}')
+                lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def resolved_view(request):
+    # The class behind the resolved URL (OrdersView, CartView, ...), the function for
+    # function views, None when nothing matched
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None) or match.func
+
+
+def view_name(view):
+    return '<unresolved>' if view is None else getattr(view, '__name__', repr(view))
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def check_budget(view, method, timings):
+    budget = getattr(view, 'query_budget', {}).get(method)
+    if budget is None or timings.queries <= budget:
+        return
+    statements = '\n'.join(f'{i}. {sql}' for i, sql in enumerate(timings.statements or (), 1))
+    raise QueryBudgetExceeded(
+        f'{view_name(view)} {method}: {timings.queries} queries, budget {budget}\n{statements}')
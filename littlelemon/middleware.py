@@ -0,0 +1,151 @@
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+from .routers import READ, WRITE, _pinned, replicas, request_scope
+from .throttling import get_store
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+_END = object()
+
+
+def _pin_keys(request):
+    # The client's pin in the current window of REPLICA_PIN_SECONDS and in the next one: a write
+    # sets both and a read checks the current one, so a client that wrote stays pinned for
+    # REPLICA_PIN_SECONDS to twice that, whatever the counter store does with expiry
+    client = request.headers.get('Authorization') or request.META.get('REMOTE_ADDR', '')
+    prefix = 'primary:' + hashlib.sha1(client.encode()).hexdigest()
+    window = int(time.time() // settings.REPLICA_PIN_SECONDS)
+    return f'{prefix}:{window}', f'{prefix}:{window + 1}'
+
+
+class ReadYourWritesMiddleware:
+    """
+    Keeps a request's reads on the primary when replicas may not have its writes yet:
+    write methods are pinned from the start, reads after a write are pinned by the router,
+    and a client that wrote is pinned for REPLICA_PIN_SECONDS (the replica sync interval).
+    Client pins live in the throttles' counter store, which every worker shares, so the
+    client's next request is pinned whichever worker it reaches.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def initial_pin(self, request, wrote_recently):
+        if request.method not in SAFE_METHODS:
+            return WRITE
+        return READ if wrote_recently else None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+        store = get_store()
+        keys = _pin_keys(request)
+        with request_scope(self.initial_pin(request, store.get(keys[0]))):
+            response = self.get_response(request)
+            if _pinned.get() == WRITE:
+                for key in keys:
+                    store.incr(key, 1, settings.REPLICA_PIN_SECONDS * 2)
+            return response
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        store = get_store()
+        keys = _pin_keys(request)
+        with request_scope(self.initial_pin(request, await store.aget(keys[0]))):
+            response = await self.get_response(request)
+            if _pinned.get() == WRITE:
+                for key in keys:
+                    await store.aincr(key, 1, settings.REPLICA_PIN_SECONDS * 2)
+            return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every request (SQL, serializing, total), adds a Server-Timing header and records
+    the numbers in metrics.registry under the resolved view. First in MIDDLEWARE so the
+    total covers the whole stack. With ENFORCE_QUERY_BUDGETS it also checks each view's
+    query_budget. Removed when REQUEST_METRICS and ENFORCE_QUERY_BUDGETS are both off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.metrics = getattr(settings, 'REQUEST_METRICS', True)
+        self.budgets = getattr(settings, 'ENFORCE_QUERY_BUDGETS', False)
+        if not (self.metrics or self.budgets):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def record(self, request, response, token):
+        timings, total = metrics.finish(token)
+        view = metrics.resolved_view(request)
+        if response.streaming and getattr(view, 'measure_stream', True):
+            # Finished as the body is consumed, by whoever consumes it
+            stream = self.astream if response.is_async else self.stream
+            response.streaming_content = stream(request, view, response.streaming_content, timings)
+            return response
+        if self.budgets:
+            metrics.check_budget(view, request.method, timings)
+        if self.metrics:
+            response['Server-Timing'] = metrics.server_timing(timings, total)
+            metrics.registry.observe(metrics.view_name(view), request.method, timings, total)
+        return response
+
+    def stream(self, request, view, content, timings):
+        chunks = iter(content)
+        finished = False
+        try:
+            while True:
+                with metrics.resumed(timings):
+                    chunk = next(chunks, _END)
+                if chunk is _END:
+                    break
+                yield chunk
+            finished = True
+        finally:
+            self.finish_stream(request, view, timings, finished)
+
+    async def astream(self, request, view, content, timings):
+        chunks = aiter(content)
+        finished = False
+        try:
+            while True:
+                with metrics.resumed(timings):
+                    chunk = await anext(chunks, _END)
+                if chunk is _END:
+                    break
+                yield chunk
+            finished = True
+        finally:
+            self.finish_stream(request, view, timings, finished)
+
+    def finish_stream(self, request, view, timings, finished):
+        total = time.perf_counter() - timings.start
+        if self.metrics:
+            metrics.registry.observe(metrics.view_name(view), request.method, timings, total)
+        if self.budgets and finished:  # a client that went away saw no more than it read
+            metrics.check_budget(view, request.method, timings)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = metrics.start(keep_statements=self.budgets)
+        return self.record(request, self.get_response(request), token)
+
+    async def __acall__(self, request):
+        token = metrics.start(keep_statements=self.budgets)
+        return self.record(request, await self.get_response(request), token)
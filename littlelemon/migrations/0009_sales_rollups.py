@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0008_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeliveryCrewStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('delivered', models.IntegerField(default=0)),
+                ('delivery_crew', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('date', 'delivery_crew')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='littlelemon.menuitem')),
+            ],
+            options={
+                'unique_together': {('date', 'menuitem')},
+            },
+        ),
+    ]
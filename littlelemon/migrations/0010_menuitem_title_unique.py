@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def rename_duplicate_titles(apps, schema_editor):
+    # Keep the oldest item's title; later duplicates become "<title> (<id>)", or
+    # "<title> (<id>-2)", ... if that is taken too, cut so the suffix fits in 255 characters
+    MenuItem = apps.get_model('littlelemon', 'MenuItem')
+    taken = set(MenuItem.objects.values_list('title', flat=True))
+    seen = set()
+    for pk, title in MenuItem.objects.order_by('id').values_list('id', 'title').iterator():
+        if title in seen:
+            suffix, n = f' ({pk})', 1
+            while (renamed := title[:255 - len(suffix)] + suffix) in taken:
+                n += 1
+                suffix = f' ({pk}-{n})'
+            MenuItem.objects.filter(pk=pk).update(title=renamed)
+            taken.add(renamed)
+        seen.add(title)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0009_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_titles, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='menuitem',
+            name='menuitem_title_idx',
+        ),
+        migrations.AlterField(
+            model_name='menuitem',
+            name='title',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0010_menuitem_title_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status', models.IntegerField(null=True)),
+                ('content_type', models.CharField(blank=True, max_length=255)),
+                ('body', models.BinaryField(null=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemon', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliverycrewstats',
+            name='name',
+            field=models.CharField(blank=True, db_default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='menuitemsales',
+            name='title',
+            field=models.CharField(blank=True, db_default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='deliverycrewstats',
+            name='delivery_crew',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='delivery_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='menuitemsales',
+            name='menuitem',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='sales', to='littlelemon.menuitem'),
+        ),
+    ]
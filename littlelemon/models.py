@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class UserManager(BaseUserManager):
     def create_user(self, email, name, password=None, **extra_fields):
@@ -31,12 +32,32 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._saved_state = user.cached_state()
+        return user
+
+    def cached_state(self):
+        # Loaded field values that token-cached copies depend on (signals.revoke_user_tokens);
+        # last_login changes on every login and is left out
+        return {f.attname: self.__dict__[f.attname] for f in self._meta.concrete_fields
+                if f.attname != 'last_login' and f.attname in self.__dict__}
+
 
 class MenuItem(models.Model):
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, unique=True)  # the key of bulk menu imports
     price = models.DecimalField(max_digits=6, decimal_places=2)
     inventory = models.PositiveIntegerField()
 
+    class Meta:
+        # ordering_fields / filters of MenuItemsView
+        # (title has its unique index)
+        indexes = [
+            models.Index(fields=['price'], name='menuitem_price_idx'),
+            models.Index(fields=['inventory'], name='menuitem_inventory_idx'),
+        ]
+
     def __str__(self):
         return self.title 
     
@@ -56,12 +77,24 @@ class CartItem(models.Model):
     
 
 class Order(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
-    delivery_crew = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='deliveries')
+    # No single-column FK indexes: the (user, -date) and (delivery_crew, -date) indexes lead with them
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders', db_index=False)
+    delivery_crew = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='deliveries', db_index=False)
     status = models.IntegerField(default=0)  # 0 = out for delivery (if delivery_crew set), 1 = delivered
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Role-scoped OrdersView lists: customer (user), delivery crew (delivery_crew, with or without status), manager (all / status)
+        indexes = [
+            models.Index(fields=['user', '-date'], name='order_user_date_idx'),
+            models.Index(fields=['delivery_crew', '-date'], name='order_crew_date_idx'),
+            models.Index(fields=['delivery_crew', 'status', '-date'], name='order_crew_status_date_idx'),
+            models.Index(fields=['status', '-date'], name='order_status_date_idx'),
+            models.Index(fields=['-date'], name='order_date_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user}"
 
@@ -70,4 +103,48 @@ class OrderItem(models.Model):
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=8, decimal_places=2)
-    price = models.DecimalField(max_digits=10, decimal_places=2)  # quantity * unit_price
\ No newline at end of file
+    price = models.DecimalField(max_digits=10, decimal_places=2)  # quantity * unit_price
+
+# Sales rollups, kept up to date by littlelemon.rollups on checkout and order changes.
+# Each row is one day (the order's date) so reports cost O(days x items), not O(orders).
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+
+# Rows outlive the menu item or crew member they count: the key keeps its id (no database
+# constraint, nothing cascades), and signals copy the title or name in just before the delete.
+class MenuItemSales(models.Model):
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 null=True, related_name='sales')  # null: reports join it LEFT OUTER
+    title = models.CharField(max_length=255, blank=True, db_default='')  # set when the menu item is deleted
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menuitem')
+
+
+class DeliveryCrewStats(models.Model):
+    date = models.DateField()
+    delivery_crew = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                                      null=True, related_name='delivery_stats')
+    name = models.CharField(max_length=255, blank=True, db_default='')  # set when the user is deleted
+    delivered = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'delivery_crew')
+
+
+class IdempotencyKey(models.Model):
+    # Idempotency-Key records (littlelemon/idempotency.py). The unique key is the lock every
+    # worker sees; status, content type and body are filled in once the first response is rendered.
+    key = models.CharField(max_length=64, unique=True)  # sha256 of user, path and header value
+    fingerprint = models.CharField(max_length=64)
+    status = models.IntegerField(null=True)  # null while the first request runs
+    content_type = models.CharField(max_length=255, blank=True)
+    body = models.BinaryField(null=True)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
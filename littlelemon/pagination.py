@@ -1,6 +1,134 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination, _reverse_ordering
 
 class DefaultPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 50
+
+
+def _position_value(value):
+    # Full precision: DjangoJSONEncoder would drop the microseconds of a datetime
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _after(ordering, position):
+    # Rows strictly after `position` in `ordering`: (a > x) OR (a = x AND b > y) ...
+    # plus a plain bound on the leading column so the database can seek on its index.
+    first = ordering[0]
+    seek = Q(**{first.lstrip('-') + ('__lte' if first.startswith('-') else '__gte'): position[0]})
+    after, equal = Q(), Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        after |= equal & Q(**{name + ('__lt' if field.startswith('-') else '__gt'): value})
+        equal &= Q(**{name: value})
+    return seek & after
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    Keyset pagination: no COUNT(*) and no OFFSET. The cursor carries the last row's values
+    for every ordering column (always ending in id), and the next page is a seek past them.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        # Always end with a unique column so rows with equal sort keys keep a stable order.
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering = ordering + ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(_after(ordering, self._decode_position(queryset.model, ordering)))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def _decode_position(self, model, ordering):
+        # The cursor's values as the ordering fields' Python types; a tampered cursor is a 404
+        try:
+            position = json.loads(self.cursor.position)
+            if not isinstance(position, list) or len(position) != len(ordering):
+                raise ValueError(position)
+            names = [field.lstrip('-') for field in ordering]
+            fields = [model._meta.pk if name == 'pk' else model._meta.get_field(name) for name in names]
+            position = [field.to_python(value) for field, value in zip(fields, position)]
+            if None in position:  # every ordering column is NOT NULL
+                raise ValueError(position)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def _position(self, instance):
+        # Model instances, or .values() dicts on the serializer-free list path
+        if isinstance(instance, dict):
+            values = [instance[field.lstrip('-')] for field in self.ordering]
+        else:
+            values = [getattr(instance, field.lstrip('-')) for field in self.ordering]
+        return json.dumps([_position_value(value) for value in values])
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+
+class SelectablePaginationMixin:
+    """
+    Lets clients opt in to cursor pagination per request while page numbers stay the default.
+    /api/...?pagination=cursor  (follow `next`/`previous` links, which carry ?cursor=)
+    """
+    cursor_pagination_class = DefaultCursorPagination
+
+    def uses_cursor_pagination(self):
+        params = self.request.query_params
+        return params.get('pagination') == 'cursor' or 'cursor' in params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.uses_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
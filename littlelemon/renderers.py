@@ -0,0 +1,63 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+from .metrics import serializing
+
+try:
+    import orjson
+except ImportError:  # optional: without it FastJSONRenderer is plain JSONRenderer
+    orjson = None
+
+_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Same bytes as JSONRenderer (compact, UTF-8, U+2028/U+2029 escaped), encoded by orjson
+    when it is installed. Dates and other non-JSON types still go through DRF's encoder.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with serializing():
+            return self.encode(data, accepted_media_type, renderer_context)
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=_OPTIONS)
+        except orjson.JSONEncodeError:  # e.g. integers past 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class PrometheusRenderer(BaseRenderer):
+    # GET /api/metrics: the view returns the exposition text; errors come out as JSON text
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode()
+        return JSONRenderer().render(data)
+
+
+class NDJSONRenderer(BaseRenderer):
+    # Selects NDJSON for streaming exports (?format=ndjson or Accept); a plain payload is one line
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data) + b'\n'
+
+
+class CSVRenderer(BaseRenderer):
+    # Selects CSV for streaming exports (?format=csv or Accept); errors come out as JSON text
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
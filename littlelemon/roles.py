@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import primary_reads
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery crew'
+
+
+def _cache_key(user_id):
+    return f'roles:{user_id}'
+
+
+def get_roles(user):
+    """
+    Group names of `user`: memoized on the user object for the request,
+    and in the cache for ROLE_CACHE_TIMEOUT seconds across requests.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            with primary_reads():  # never cache a replica's stale groups
+                roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, roles, getattr(settings, 'ROLE_CACHE_TIMEOUT', 60))
+        user._roles = roles
+    return roles
+
+
+async def aget_roles(user):
+    # get_roles for async views: same memo and cache, async cache and ORM calls
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        roles = await cache.aget(key)
+        if roles is None:
+            with primary_reads():
+                roles = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+            await cache.aset(key, roles, getattr(settings, 'ROLE_CACHE_TIMEOUT', 60))
+        user._roles = roles
+    return roles
+
+
+def invalidate_roles(user):
+    # Call after changing a user's groups
+    cache.delete(_cache_key(user.pk))
+    user.__dict__.pop('_roles', None)
+
+
+def is_manager(user):
+    return MANAGER in get_roles(user)
+
+
+def is_delivery_crew(user):
+    return DELIVERY_CREW in get_roles(user)
+
+
+def is_customer(user):
+    # Customer = authenticated user NOT in Manager or Delivery crew groups.
+    return user.is_authenticated and not (get_roles(user) & {MANAGER, DELIVERY_CREW})
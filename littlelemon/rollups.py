@@ -0,0 +1,163 @@
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import DailySales, DeliveryCrewStats, MenuItem, MenuItemSales, OrderItem, User
+
+DELIVERED = 1
+_ROWS_PER_STATEMENT = 200  # keeps bound parameters well under SQLite's limit
+_purging = ContextVar('rollups_purging', default=False)
+
+
+def _add(model, key_fields, rows):
+    """
+    Add amounts to rollup rows in one statement per batch, creating missing rows:
+    INSERT ... ON CONFLICT (keys) DO UPDATE SET col = col + excluded.col
+    `rows` maps key tuples to {field: amount}; every value dict has the same fields.
+    (The ORM's bulk_create(update_conflicts=True) can only overwrite, not add.)
+    """
+    rows = [(key, amounts) for key, amounts in rows.items() if any(amounts.values())]
+    if not rows:
+        return
+    meta = model._meta
+    qn = connection.ops.quote_name
+    value_fields = list(rows[0][1])
+    fields = [meta.get_field(name) for name in list(key_fields) + value_fields]
+    table = qn(meta.db_table)
+    columns = ', '.join(qn(f.column) for f in fields)
+    conflict = ', '.join(qn(meta.get_field(name).column) for name in key_fields)
+    updates = ', '.join(
+        f'{qn(meta.get_field(name).column)} = {table}.{qn(meta.get_field(name).column)} + excluded.{qn(meta.get_field(name).column)}'
+        for name in value_fields
+    )
+    row_sql = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), _ROWS_PER_STATEMENT):
+            batch = rows[start:start + _ROWS_PER_STATEMENT]
+            params = []
+            for key, amounts in batch:
+                values = list(key) + [amounts[name] for name in value_fields]
+                params += [f.get_db_prep_value(v, connection) for f, v in zip(fields, values)]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([row_sql] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params,
+            )
+
+
+class _Totals:
+    # Accumulates rollup deltas for any number of orders, then writes them in three statements
+    def __init__(self):
+        self.daily = defaultdict(lambda: {'orders': 0, 'revenue': 0})
+        self.items = defaultdict(lambda: {'units': 0, 'revenue': 0})
+        self.crew = defaultdict(lambda: {'delivered': 0})
+
+    def order(self, day, total, sign=1):
+        self.daily[(day,)]['orders'] += sign
+        self.daily[(day,)]['revenue'] += sign * total
+
+    def line(self, day, menuitem_id, quantity, price, sign=1):
+        self.items[(day, menuitem_id)]['units'] += sign * quantity
+        self.items[(day, menuitem_id)]['revenue'] += sign * price
+
+    def delivery(self, day, crew_id, status, sign=1):
+        if crew_id is not None and status == DELIVERED:
+            self.crew[(day, crew_id)]['delivered'] += sign
+
+    def save(self):
+        _add(DailySales, ('date',), self.daily)
+        _add(MenuItemSales, ('date', 'menuitem'), self.items)
+        _add(DeliveryCrewStats, ('date', 'delivery_crew'), self.crew)
+
+
+def _day(order_date):
+    return timezone.localdate(order_date)
+
+
+def record_order_placed(order, order_items):
+    totals = _Totals()
+    day = _day(order.date)
+    totals.order(day, order.total)
+    for item in order_items:
+        totals.line(day, item.menuitem_id, item.quantity, item.price)
+    totals.delivery(day, order.delivery_crew_id, order.status)
+    totals.save()
+
+
+def record_delivery_change(order, old_crew_id, old_status):
+    # Call after changing an order's status or delivery_crew
+    record_delivery_changes([(order.date, old_crew_id, old_status, order.delivery_crew_id, order.status)])
+
+
+def record_delivery_changes(changes):
+    # Many orders at once: (date, old crew id, old status, new crew id, new status) per order
+    totals = _Totals()
+    for date, old_crew_id, old_status, crew_id, status in changes:
+        day = _day(date)
+        totals.delivery(day, old_crew_id, old_status, sign=-1)
+        totals.delivery(day, crew_id, status)
+    totals.save()
+
+
+def record_order_deleted(order):
+    # Before the order and its lines are deleted: signals.forget_deleted_order, for every delete path
+    if _purging.get():
+        return
+    totals = _Totals()
+    day = _day(order.date)
+    totals.order(day, order.total, sign=-1)
+    for menuitem_id, quantity, price in OrderItem.objects.filter(order=order).values_list('menuitem_id', 'quantity', 'price'):
+        totals.line(day, menuitem_id, quantity, price, sign=-1)
+    totals.delivery(day, order.delivery_crew_id, order.status, sign=-1)
+    totals.save()
+
+
+def purge(users, menu_items):
+    """
+    Delete generated `users` and `menu_items` (querysets) with their orders and their rows in
+    the rollups, for the seed and benchmark commands. Orders are not subtracted one by one:
+    follow with rebuild(), in the same transaction.
+    """
+    token = _purging.set(True)
+    try:
+        DeliveryCrewStats.objects.filter(delivery_crew__in=users.values('pk')).delete()
+        MenuItemSales.objects.filter(menuitem__in=menu_items.values('pk')).delete()
+        users.delete()
+        menu_items.delete()
+    finally:
+        _purging.reset(token)
+
+
+def rebuild(orders, chunk_size=1000):
+    """
+    Recompute every rollup from `orders` (an Order queryset), reading it in primary-key
+    chunks so memory stays flat. Call inside a transaction. Rows of deleted menu items and
+    crew members are kept: the orders no longer name them, so they are the only record.
+    """
+    DailySales.objects.all().delete()
+    MenuItemSales.objects.filter(menuitem__in=MenuItem.objects.values('pk')).delete()
+    DeliveryCrewStats.objects.filter(delivery_crew__in=User.objects.values('pk')).delete()
+
+    last_id, count = 0, 0
+    while True:
+        chunk = list(
+            orders.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'date', 'total', 'status', 'delivery_crew_id')[:chunk_size]
+        )
+        if not chunk:
+            return count
+        totals = _Totals()
+        days = {}
+        for order_id, date, total, status, crew_id in chunk:
+            days[order_id] = _day(date)
+            totals.order(days[order_id], total)
+            totals.delivery(days[order_id], crew_id, status)
+        lines = OrderItem.objects.filter(order_id__in=days).values_list('order_id', 'menuitem_id', 'quantity', 'price')
+        for order_id, menuitem_id, quantity, price in lines:
+            totals.line(days[order_id], menuitem_id, quantity, price)
+        totals.save()
+        last_id = chunk[-1][0]
+        count += len(chunk)
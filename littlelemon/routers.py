@@ -0,0 +1,90 @@
+"""
+Primary/replica routing (settings.DATABASE_REPLICAS, from LITTLELEMON_REPLICAS).
+
+Writes always go to `default`. Reads go to a random replica unless the current request
+must see the primary: it is a write request, it has already written, it is inside a
+transaction on the primary, or the same client wrote within REPLICA_PIN_SECONDS
+(see ReadYourWritesMiddleware). Outside a request (management commands, background
+loops) a write pins nothing: read your own writes there inside primary_reads() or the
+write's transaction. With no replicas configured everything stays on default.
+"""
+import contextlib
+import contextvars
+import random
+import sqlite3
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# None: reads may use replicas; READ: pinned because the client wrote recently;
+# WRITE: pinned because this request writes (and so pins the client in turn)
+READ, WRITE = 'read', 'write'
+_pinned = contextvars.ContextVar('littlelemon_primary_pinned', default=None)
+# True while ReadYourWritesMiddleware handles a request: the scope a write may pin
+_in_request = contextvars.ContextVar('littlelemon_replica_request', default=False)
+
+
+def is_pinned():
+    return _pinned.get() is not None
+
+
+@contextlib.contextmanager
+def primary_reads():
+    # Read from the primary inside the block, e.g. to fill a cache that must not go stale
+    token = _pinned.set(_pinned.get() or READ)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@contextlib.contextmanager
+def request_scope(pin):
+    # One request's pinning, for ReadYourWritesMiddleware; `pin` is its starting state
+    tokens = _pinned.set(pin), _in_request.set(True)
+    try:
+        yield
+    finally:
+        _in_request.reset(tokens[1])
+        _pinned.reset(tokens[0])
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or _pinned.get() is not None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        if _in_request.get():
+            _pinned.set(WRITE)  # read-your-writes for the rest of the request; request_scope undoes it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema with the data (manage.py sync_replicas)
+        return db not in replicas()
+
+
+def copy_database(source, path):
+    # Consistent snapshot of `source` (a SQLite connection wrapper) into the file at `path`,
+    # using SQLite's online backup so the primary keeps serving while it runs.
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+def sync_replicas():
+    for alias in replicas():
+        copy_database(connections[DEFAULT_DB_ALIAS], connections[alias].settings_dict['NAME'])
+        connections[alias].close()  # reopen on the fresh copy
@@ -1,15 +1,25 @@
 from rest_framework import serializers
+from .metrics import TimedRepresentationMixin
 from .models import MenuItem,CartItem
-from .models import Order, OrderItem, MenuItem
+from .models import Order, OrderItem, MenuItem, DailySales
 from django.contrib.auth import get_user_model
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuItem
         fields = ['id', 'title', 'price', 'inventory']
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class MenuItemImportSerializer(serializers.ModelSerializer):
+    # One row of a bulk menu import: MenuItemSerializer's rules, except that an existing
+    # title is not an error (the row updates that item)
+    class Meta:
+        model = MenuItem
+        fields = ['title', 'price', 'inventory']
+        extra_kwargs = {'title': {'validators': []}}
+
+
+class CartItemSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     title = serializers.CharField(source='menuitem.title', read_only=True)
 
     class Meta:
@@ -27,9 +37,53 @@ class AddCartItemSerializer(serializers.Serializer):
         return value
 
 
+class CartLineSerializer(serializers.Serializer):
+    menuitem_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class AddCartItemsSerializer(serializers.Serializer):
+    # Body: { "items": [ { "menuitem_id": <int>, "quantity": <int> }, ... ] }
+    items = CartLineSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, value):
+        # One IN query for every line; duplicate ids are merged
+        quantities = {}
+        for line in value:
+            quantities[line['menuitem_id']] = quantities.get(line['menuitem_id'], 0) + line['quantity']
+        prices = dict(MenuItem.objects.filter(id__in=quantities).values_list('id', 'price'))
+        missing = sorted(set(quantities) - set(prices))
+        if missing:
+            raise serializers.ValidationError(f"Menu items not found: {missing}")
+        return [
+            {'menuitem_id': pk, 'quantity': qty, 'unit_price': prices[pk]}
+            for pk, qty in quantities.items()
+        ]
+
+
 User = get_user_model()
 
-class OrderItemSerializer(serializers.ModelSerializer):
+
+class SparseFieldsMixin:
+    """
+    Cut a serializer down per request: `fields` keeps only the named fields, and nested
+    `expandable_fields` are left out unless named in `fields` or `expand`.
+    With neither argument the serializer is unchanged.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            return
+        keep = set(self.fields) - set(self.expandable_fields) if fields is None else set(fields)
+        keep |= set(expand or ())
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+
+class OrderItemSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     title = serializers.CharField(source='menuitem.title', read_only=True)
 
     class Meta:
@@ -37,7 +91,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'menuitem', 'title', 'quantity', 'unit_price', 'price']
         read_only_fields = ['unit_price', 'price', 'title']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('order_items',)
     order_items = OrderItemSerializer(many=True, read_only=True)
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     delivery_crew = serializers.PrimaryKeyRelatedField(
@@ -49,4 +104,43 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'order_items']
-        read_only_fields = ['user', 'total', 'date']
\ No newline at end of file
+        read_only_fields = ['user', 'total', 'date']
+
+
+class DailySalesSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DailySales
+        fields = ['date', 'orders', 'revenue']
+
+class MenuItemSalesSerializer(TimedRepresentationMixin, serializers.Serializer):
+    menuitem = serializers.IntegerField()
+    title = serializers.CharField(source='label')  # the item's title, or its last one if deleted
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+class DeliveryCrewStatsSerializer(TimedRepresentationMixin, serializers.Serializer):
+    delivery_crew = serializers.IntegerField()
+    name = serializers.CharField(source='label')
+    delivered = serializers.IntegerField()
+
+
+class DispatchSerializer(serializers.Serializer):
+    # Body of POST /api/orders/dispatch; both optional
+    limit = serializers.IntegerField(min_value=1, required=False)      # orders to assign in this run
+    capacity = serializers.IntegerField(min_value=1, required=False)   # max open deliveries per crew member
+
+
+class BulkOrderUpdateSerializer(serializers.Serializer):
+    # Body of PATCH /api/orders/bulk: { "ids": [1, 2, 3], "status": 1, "delivery_crew": 7 }
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=[0, 1], required=False)
+    delivery_crew = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(groups__name='Delivery crew'),
+        allow_null=True,
+        required=False
+    )
+
+    def validate(self, attrs):
+        if 'status' not in attrs and 'delivery_crew' not in attrs:
+            raise serializers.ValidationError('Give status and/or delivery_crew.')
+        return attrs
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from .cache import bump_menu_version
+from .events import CREATED, instance_event, publish_order_events
+from .models import CartItem, MenuItem, Order, OrderItem
+from .rollups import record_order_placed
+
+
+class EmptyCart(Exception):
+    def __init__(self):
+        super().__init__('Cart is empty.')
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        # [{'menuitem': id, 'requested': qty, 'available': inventory}, ...]
+        self.shortages = shortages
+        super().__init__('Insufficient inventory.')
+
+
+def reserve_stock(quantities):
+    """
+    Decrement MenuItem.inventory for every {menuitem_id: qty} in one conditional UPDATE.
+    Either all lines are reserved or none are, and InsufficientStock lists the short ones.
+    Call inside the checkout transaction so the stock is released if the order fails.
+    """
+    if not quantities:
+        return
+    requested = Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()],
+        output_field=PositiveIntegerField(),
+    )
+    with transaction.atomic():
+        updated = (
+            MenuItem.objects
+            .filter(pk__in=quantities, inventory__gte=requested)
+            .update(inventory=F('inventory') - requested)
+        )
+        if updated != len(quantities):
+            transaction.set_rollback(True)
+    if updated == len(quantities):
+        bump_menu_version()
+        return
+
+    # Savepoint rolled back; the rows are still locked by this transaction, so this read is exact
+    available = dict(MenuItem.objects.filter(pk__in=quantities).values_list('pk', 'inventory'))
+    raise InsufficientStock([
+        {'menuitem': pk, 'requested': qty, 'available': available.get(pk, 0)}
+        for pk, qty in quantities.items()
+        if available.get(pk, 0) < qty
+    ])
+
+
+@transaction.atomic
+def checkout(user):
+    """
+    Turn the user's cart into an Order with a fixed number of statements whatever the
+    cart size: lock and read cart, reserve stock, insert order, insert lines, delete cart,
+    update the sales rollups.
+    The returned order has its lines (and their menu items) attached, so serializing
+    it needs no further queries.
+    """
+    cart_items = list(CartItem.objects.select_for_update().filter(user=user).select_related('menuitem'))
+    if not cart_items:
+        raise EmptyCart()
+
+    reserve_stock({ci.menuitem_id: ci.quantity for ci in cart_items})
+
+    order = Order.objects.create(user=user, status=0, total=sum(ci.price for ci in cart_items))
+    order_items = OrderItem.objects.bulk_create([
+        OrderItem(order=order, menuitem=ci.menuitem, quantity=ci.quantity, unit_price=ci.unit_price, price=ci.price)
+        for ci in cart_items
+    ])
+    CartItem.objects.filter(pk__in=[ci.pk for ci in cart_items]).delete()
+    record_order_placed(order, order_items)
+    publish_order_events([instance_event(CREATED, order)])
+
+    # Same cache prefetch_related('order_items') would fill
+    order._prefetched_objects_cache = {'order_items': order_items}
+    return order
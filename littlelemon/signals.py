@@ -0,0 +1,80 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import revoke_token
+from .cache import bump_menu_version
+from .metrics import sql_timer
+from .models import DeliveryCrewStats, MenuItem, MenuItemSales, Order, User
+from .roles import invalidate_roles
+from .rollups import record_order_deleted
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_cache(sender, **kwargs):
+    bump_menu_version()
+
+
+# Sent for each order however it goes: the order view, queryset deletes, and the cascade
+# from its customer's deletion
+@receiver(pre_delete, sender=Order)
+def forget_deleted_order(sender, instance, **kwargs):
+    record_order_deleted(instance)
+
+
+# Sales history outlives the menu item and the crew member; keep the label reports show
+@receiver(pre_delete, sender=MenuItem)
+def keep_menu_item_title(sender, instance, **kwargs):
+    MenuItemSales.objects.filter(menuitem=instance).update(title=instance.title)
+
+
+@receiver(pre_delete, sender=User)
+def keep_crew_name(sender, instance, **kwargs):
+    DeliveryCrewStats.objects.filter(delivery_crew=instance).update(name=instance.name)
+
+
+# djoser's token/logout deletes the user's Token rows
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    revoke_token(instance.key)
+
+
+def _revoke_tokens_of(user_ids):
+    for key in Token.objects.filter(user__in=user_ids).values_list('key', flat=True):
+        revoke_token(key)
+
+
+# Drop cached users when a field they were cached with changes (deactivation, password, ...).
+# Saves that change nothing cached, such as djoser's last_login update on login, skip the query.
+@receiver(post_save, sender=User)
+def revoke_user_tokens(sender, instance, created, update_fields, **kwargs):
+    previous, instance._saved_state = getattr(instance, '_saved_state', None), instance.cached_state()
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    if previous == instance._saved_state:
+        return
+    _revoke_tokens_of([instance.pk])
+
+
+# Cached users carry their roles, so group changes (from either side) drop them too
+@receiver(m2m_changed, sender=User.groups.through)
+def revoke_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':  # group.user_set.clear(): the members, while they are known
+        user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove') or (action == 'post_clear' and not reverse):
+        user_ids = list(pk_set) if reverse else [instance.pk]
+    else:
+        return
+    for user_id in user_ids:
+        invalidate_roles(User(pk=user_id))
+    _revoke_tokens_of(user_ids)
+
+
+# Every connection times its queries for RequestMetricsMiddleware (once: reconnects reuse the wrapper)
+@receiver(connection_created)
+def install_sql_timer(sender, connection, **kwargs):
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, sql_timer)
@@ -0,0 +1,59 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+CSV_CONTENT_TYPE = 'text/csv'
+STREAM_CHUNK_SIZE = 2000
+
+# Same compact output as rest_framework.renderers.JSONRenderer
+_encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def ndjson_line(row):
+    return _encoder.encode(row) + '\n'
+
+
+def ndjson_lines(rows):
+    # One JSON document per line; rows is any iterable of dicts (e.g. queryset.values().iterator())
+    for row in rows:
+        yield ndjson_line(row)
+
+
+async def andjson_lines(rows):
+    # Same for an async iterable (e.g. queryset.values().aiterator())
+    async for row in rows:
+        yield ndjson_line(row)
+
+
+class _Echo:
+    # csv.writer target that hands each formatted line back instead of storing it
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    # Header, then one line per row; rows is any iterable of tuples (e.g. .values_list().iterator())
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+async def acsv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    async for row in rows:
+        yield writer.writerow(row)
+
+
+def streaming_response(lines, content_type, filename=None):
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def ndjson_response(rows, filename=None):
+    return streaming_response(ndjson_lines(rows), NDJSON_CONTENT_TYPE, filename)
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    manage.py test: query budgets are enforced whatever DEBUG says (tests.APITestCase also
+    overrides the setting, for other runners), and rate-limit counters go to a scratch file.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.ENFORCE_QUERY_BUDGETS = True
+        self.throttle_dir = tempfile.TemporaryDirectory()
+        settings.THROTTLE_STORE = os.path.join(self.throttle_dir.name, 'throttle.sqlite3')
+
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
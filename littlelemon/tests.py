@@ -1,3 +1,1502 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import re
+import tempfile
+import threading
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import load_backend
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import async_views, dispatch, idempotency, menu_bulk, order_export, rollups, throttling, urls, views
+from .authentication import _local_tokens
+from .cache import MENU_VERSION_KEY, bump_menu_version
+from .middleware import ReadYourWritesMiddleware
+from .pagination import DefaultCursorPagination, _after
+from .routers import PrimaryReplicaRouter, copy_database, primary_reads
+from .throttling import CacheCounterStore, SQLiteCounterStore, ScopedRateThrottle, get_store
+from .dispatch import plan
+from .events import LocalBroker, Overflow, get_broker, order_event
+from .models import User, MenuItem, CartItem, Order, OrderItem, DailySales, DeliveryCrewStats, IdempotencyKey
+from .views import MenuItemsView, OrdersView
+from . import fastpath, metrics
+from .renderers import FastJSONRenderer
+from .serializers import MenuItemSerializer, OrderSerializer
+from rest_framework.renderers import JSONRenderer
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], ENFORCE_QUERY_BUDGETS=True)
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_store().clear()  # throttle history
+        self.manager_group = Group.objects.create(name='Manager')
+        self.crew_group = Group.objects.create(name='Delivery crew')
+        self.manager = User.objects.create_user('manager@example.com', 'Manager', 'pass1234')
+        self.manager.groups.add(self.manager_group)
+        self.crew = User.objects.create_user('crew@example.com', 'Crew', 'pass1234')
+        self.crew.groups.add(self.crew_group)
+        self.customer = User.objects.create_user('customer@example.com', 'Customer', 'pass1234')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class MenuItemsListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Dish {i:02d}', price=Decimal(i), inventory=i) for i in range(1, 13)
+        ])
+        self.client = self.client_for(self.customer)
+
+    def test_page_number_pagination_and_filters(self):
+        response = self.client.get('/api/menu-items', {'min_price': 5, 'ordering': '-price', 'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 8)
+        self.assertEqual([row['title'] for row in response.json()['results']], ['Dish 12', 'Dish 11', 'Dish 10'])
+
+    def test_search(self):
+        response = self.client.get('/api/menu-items', {'search': 'dish 12'})
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_cursor_pagination_walks_every_row_once(self):
+        seen = []
+        response = self.client.get('/api/menu-items', {'pagination': 'cursor', 'ordering': 'price'})
+        while True:
+            self.assertNotIn('count', response.json())
+            seen += [row['id'] for row in response.json()['results']]
+            if not response.json()['next']:
+                break
+            response = self.client.get(response.json()['next'])
+        self.assertEqual(seen, list(MenuItem.objects.order_by('price').values_list('id', flat=True)))
+
+    def test_ndjson_stream(self):
+        response = self.client.get('/api/menu-items', {'stream': 'ndjson', 'max_price': 2})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': 1, 'title': 'Dish 01', 'price': '1.00', 'inventory': 1},
+            {'id': 2, 'title': 'Dish 02', 'price': '2.00', 'inventory': 2},
+        ])
+
+
+class MenuCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = MenuItem.objects.create(title='Soup', price=Decimal('4.50'), inventory=10)
+        self.client = self.client_for(self.customer)
+
+    def test_etag_revalidation_skips_the_database(self):
+        first = self.client.get(f'/api/menu-items/{self.item.pk}')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            cached = self.client.get(f'/api/menu-items/{self.item.pk}')
+            not_modified = self.client.get(f'/api/menu-items/{self.item.pk}', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_writes_invalidate_list_and_detail(self):
+        listing = self.client.get('/api/menu-items')
+        detail = self.client.get(f'/api/menu-items/{self.item.pk}')
+        manager = self.client_for(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            manager.patch(f'/api/menu-items/{self.item.pk}', {'price': '5.00'}, format='json')
+
+        response = self.client.get(f'/api/menu-items/{self.item.pk}', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['price'], '5.00')
+        response = self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH=listing['ETag'])
+        self.assertEqual(json.loads(response.content)['results'][0]['price'], '5.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            manager.delete(f'/api/menu-items/{self.item.pk}')
+        self.assertEqual(self.client.get('/api/menu-items').json()['count'], 0)
+
+    def test_evicted_version_never_serves_a_stale_page(self):
+        def price():
+            return self.client.get('/api/menu-items').json()['results'][0]['price']
+        price()
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_menu_version()
+        price()  # pages now cached under two versions
+
+        MenuItem.objects.filter(pk=self.item.pk).update(price=Decimal('6.00'))  # sends no signal
+        cache.delete(MENU_VERSION_KEY)  # evicted, e.g. culled by FileBasedCache
+        self.assertEqual(price(), '6.00')
+
+        MenuItem.objects.filter(pk=self.item.pk).update(price=Decimal('7.00'))
+        cache.delete(MENU_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_menu_version()  # incr on the missing key
+        self.assertEqual(price(), '7.00')
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_pages_are_cached_per_scheme_and_host(self):
+        MenuItem.objects.bulk_create([MenuItem(title=f'Dish {i}', price=1, inventory=1) for i in range(3)])
+        for host, secure in (('a.example.com', False), ('b.example.com', False), ('b.example.com', True)):
+            with self.subTest(host=host, secure=secure):
+                page = self.client.get('/api/menu-items', {'page_size': 2}, HTTP_HOST=host, secure=secure).json()
+                self.assertTrue(page['next'].startswith(f'{"https" if secure else "http"}://{host}/'))
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+            with override_settings(CACHES=caches):
+                first = self.client.get('/api/menu-items')
+                again = self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(again.status_code, 304)
+
+
+class MenuBulkTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.50'), inventory=10)
+        self.client = self.client_for(self.manager)
+
+    def post(self, body, content_type='text/csv', client=None):
+        return (client or self.client).post('/api/menu-items/bulk', body, content_type=content_type)
+
+    def test_csv_import_upserts_by_title(self):
+        listing = self.client.get('/api/menu-items')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post('id,title,price,inventory\n99,Soup,5.00,20\n,Cake,3.00,4\n,"Tea, green",1.50,9\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'rows': 3, 'created': 2, 'updated': 1})
+        self.soup.refresh_from_db()
+        self.assertEqual((self.soup.price, self.soup.inventory), (Decimal('5.00'), 20))  # same row, id ignored
+        self.assertEqual(MenuItem.objects.get(title='Tea, green').inventory, 9)
+        response = self.client.get('/api/menu-items', HTTP_IF_NONE_MATCH=listing['ETag'])
+        self.assertEqual(response.json()['count'], 3)  # the menu cache was invalidated
+
+    def test_ndjson_import(self):
+        body = '{"title": "Soup", "price": "6.00", "inventory": 1}\n\n{"title": "Pie", "price": "2.00", "inventory": 3}\n'
+        response = self.post(body, 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response.json(), {'rows': 2, 'created': 1, 'updated': 1})
+        self.assertEqual(MenuItem.objects.get(title='Pie').price, Decimal('2.00'))
+
+    def test_invalid_rows_import_nothing(self):
+        response = self.post('title,price,inventory\nCake,3.00,4\nSoup,cheap,1\n,1.00,1\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(e['line'], sorted(e['errors'])) for e in response.json()['errors']],
+                         [(3, ['price']), (4, ['title'])])
+        response = self.post('{"title": "Cake", "price": "3.00", "inventory": 4}\nnot json\n', 'application/x-ndjson')
+        self.assertEqual(response.json()['errors'][0]['line'], 2)
+        self.assertFalse(MenuItem.objects.filter(title='Cake').exists())
+        self.assertEqual(MenuItem.objects.get(title='Soup').price, Decimal('4.50'))
+
+    def test_the_whole_upload_is_read_before_the_transaction_opens(self):
+        queries_while_reading = []
+
+        def rows():
+            for number in range(1, 6):
+                queries_while_reading.append(len(queries))
+                yield number, {'title': f'Dish {number}', 'price': '1.00', 'inventory': number}
+
+        with mock.patch.object(menu_bulk, 'STREAM_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            summary = menu_bulk.import_rows(rows())
+        self.assertEqual(summary, {'rows': 5, 'created': 5, 'updated': 0})
+        self.assertEqual(queries_while_reading, [0] * 5)
+        self.assertEqual(MenuItem.objects.get(title='Dish 4').inventory, 4)
+
+    def test_managers_only_and_known_formats(self):
+        self.assertEqual(self.post('title,price,inventory\n', client=self.client_for(self.customer)).status_code, 403)
+        self.assertEqual(self.post('[]', 'application/json').status_code, 415)
+
+    def test_exports_stream_and_round_trip(self):
+        MenuItem.objects.create(title='Café, "crème"', price=Decimal('12.00'), inventory=0)
+        response = self.client.get('/api/menu-items/bulk?format=csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="menu-items.csv"', response['Content-Disposition'])
+        exported = b''.join(response.streaming_content)
+        self.assertTrue(exported.startswith(b'id,title,price,inventory\r\n'))
+
+        response = self.client.get('/api/menu-items/bulk', HTTP_ACCEPT='application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['title'] for row in lines], ['Soup', 'Café, "crème"'])
+
+        MenuItem.objects.all().delete()
+        self.assertEqual(self.post(exported).json(), {'rows': 2, 'created': 2, 'updated': 0})
+        self.assertEqual(MenuItem.objects.get(title='Café, "crème"').price, Decimal('12.00'))
+
+    def test_command_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/menu.ndjson'
+            call_command('menu_items', 'export', path, stderr=StringIO())
+            MenuItem.objects.filter(pk=self.soup.pk).update(price=Decimal('1.00'))
+            out = StringIO()
+            call_command('menu_items', 'import', path, stdout=out)
+        self.assertIn('1 rows: 0 created, 1 updated', out.getvalue())
+        self.assertEqual(MenuItem.objects.get(pk=self.soup.pk).price, Decimal('4.50'))
+
+
+class TitleUniqueMigrationTests(TransactionTestCase):
+    before = [('littlelemon', '0009_sales_rollups')]
+    after = [('littlelemon', '0010_menuitem_title_unique')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_renamed_duplicates_never_collide(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        Item = executor.loader.project_state(self.before).apps.get_model('littlelemon', 'MenuItem')
+        first, second = (Item.objects.create(title='Pasta', price=1, inventory=1) for _ in range(2))
+        for taken in (f'Pasta ({second.pk})', f'Pasta ({second.pk}-2)'):  # real items already
+            Item.objects.create(title=taken, price=1, inventory=1)
+        long_title = 'x' * 255
+        long_items = [Item.objects.create(title=long_title, price=1, inventory=1) for _ in range(2)]
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        titles = dict(MenuItem.objects.values_list('pk', 'title'))
+        self.assertEqual(titles[first.pk], 'Pasta')
+        self.assertEqual(titles[second.pk], f'Pasta ({second.pk}-3)')
+        self.assertEqual(titles[long_items[0].pk], long_title)
+        suffix = f' ({long_items[1].pk})'
+        self.assertEqual(titles[long_items[1].pk], long_title[:255 - len(suffix)] + suffix)
+        self.assertEqual(len(set(titles.values())), len(titles))
+
+
+class RoleCacheTests(APITestCase):
+    def test_roles_load_once_and_are_shared_across_requests(self):
+        client = self.client_for(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/orders')
+            client.get('/api/orders')
+        group_queries = [q['sql'] for q in queries if 'auth_group' in q['sql']]
+        self.assertEqual(len(group_queries), 1)
+
+    def test_group_membership_changes_invalidate(self):
+        customer = self.client_for(self.customer)
+        self.assertEqual(customer.get('/api/cart/menu-items').status_code, 200)
+        response = self.client_for(self.manager).post('/api/groups/delivery-crew/users', {'user_id': self.customer.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client_for(User.objects.get(pk=self.customer.pk)).get('/api/cart/menu-items').status_code, 403)
+
+        self.client_for(self.manager).delete(f'/api/groups/delivery-crew/users/{self.customer.pk}')
+        self.assertEqual(self.client_for(User.objects.get(pk=self.customer.pk)).get('/api/cart/menu-items').status_code, 200)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        _local_tokens.clear()
+        response = APIClient().post('/api/token/login/', {'email': 'customer@example.com', 'password': 'pass1234'}, format='json')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.json()['auth_token'])
+
+    def test_cached_token_skips_the_database(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/cart/menu-items')
+        self.assertFalse([q['sql'] for q in queries if 'authtoken_token' in q['sql'] or 'auth_group' in q['sql']])
+
+    def test_logout_revokes(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.assertEqual(self.client.post('/api/token/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+    def test_deactivation_revokes(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+    def test_revocation_reaches_copies_cached_by_other_workers(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        # Another worker's revoke cannot reach this worker's LRU, only the shared revision
+        with mock.patch.object(_local_tokens, 'delete'):
+            self.customer.is_active = False
+            self.customer.save()
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+    def test_roles_are_cached_with_the_user(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        cache.delete(f'roles:{self.customer.pk}')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'auth_group' in q['sql']])
+
+    def test_group_changes_revoke(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        crew = Group.objects.get(name='Delivery crew')
+        crew.user_set.add(self.customer)
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 403)
+        crew.user_set.clear()
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+
+    def test_saves_that_change_no_cached_field_do_not_revoke(self):
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+        user = User.objects.get(pk=self.customer.pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.last_login = datetime.now(dt_timezone.utc)
+            user.save(update_fields=['last_login'])
+            user.save()
+        self.assertFalse([q['sql'] for q in queries if 'authtoken_token' in q['sql']])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/cart/menu-items')
+        self.assertFalse([q['sql'] for q in queries if 'authtoken_token' in q['sql']])
+
+
+class CheckoutInventoryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), inventory=5)
+        self.cake = MenuItem.objects.create(title='Cake', price=Decimal('3.00'), inventory=1)
+        self.client = self.client_for(self.customer)
+
+    def add_to_cart(self, item, quantity):
+        return self.client.post('/api/cart/menu-items', {'menuitem_id': item.pk, 'quantity': quantity}, format='json')
+
+    def test_checkout_decrements_inventory(self):
+        self.add_to_cart(self.soup, 2)
+        self.add_to_cart(self.cake, 1)
+        self.assertEqual(self.client.post('/api/orders').status_code, 201)
+        self.assertEqual(MenuItem.objects.get(pk=self.soup.pk).inventory, 3)
+        self.assertEqual(MenuItem.objects.get(pk=self.cake.pk).inventory, 0)
+
+    def test_short_lines_are_reported_and_nothing_is_reserved(self):
+        self.add_to_cart(self.soup, 2)
+        self.add_to_cart(self.cake, 3)
+        response = self.client.post('/api/orders')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['items'], [{'menuitem': self.cake.pk, 'requested': 3, 'available': 1}])
+        self.assertEqual(MenuItem.objects.get(pk=self.soup.pk).inventory, 5)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(CartItem.objects.filter(user=self.customer).count(), 2)
+
+    def test_checkout_statement_count_does_not_grow_with_the_cart(self):
+        counts = []
+        for size in (1, 10):
+            items = MenuItem.objects.bulk_create([
+                MenuItem(title=f'Side {size}-{i}', price=Decimal('1.50'), inventory=5) for i in range(size)
+            ])
+            self.client.post('/api/cart/menu-items', {'items': [{'menuitem_id': i.pk} for i in items]}, format='json')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/orders')
+            counts.append(len(queries))
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json()['total'], str(Decimal('1.50') * size))
+            self.assertEqual([line['title'] for line in response.json()['order_items']], [i.title for i in items])
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(CartItem.objects.filter(user=self.customer).exists())
+
+
+class BulkCartTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = MenuItem.objects.bulk_create([
+            MenuItem(title=f'Dish {i}', price=Decimal('2.50'), inventory=50) for i in range(12)
+        ])
+        self.client = self.client_for(self.customer)
+
+    def test_batch_add_upserts_every_line_in_one_request(self):
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.items[0].pk, 'quantity': 2}, format='json')
+        lines = [{'menuitem_id': item.pk, 'quantity': 1} for item in self.items]
+        with self.assertNumQueries(6):  # savepoint, IN, current lines, upsert, cart, release
+            response = self.client.post('/api/cart/menu-items', {'items': lines}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 12)
+        first = CartItem.objects.get(user=self.customer, menuitem=self.items[0])
+        self.assertEqual((first.quantity, first.price), (3, Decimal('7.50')))
+
+    def test_batch_rejects_unknown_items(self):
+        lines = [{'menuitem_id': self.items[0].pk}, {'menuitem_id': 999}]
+        response = self.client.post('/api/cart/menu-items', {'items': lines}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), inventory=5)
+        self.client = self.client_for(self.customer)
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk}, format='json')
+
+    def test_retried_checkout_replays_the_stored_response(self):
+        first = self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='abc')
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))  # the rendered bytes
+        self.assertEqual(retry['Content-Type'], first['Content-Type'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse([q for q in queries if 'littlelemon_order' in q['sql']])
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk}, format='json', HTTP_IDEMPOTENCY_KEY='k')
+        response = self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk, 'quantity': 3},
+                                    format='json', HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(CartItem.objects.get(user=self.customer).quantity, 2)
+
+    def test_expired_key_is_taken_over(self):
+        CartItem.objects.all().delete()
+        self.assertEqual(self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='e').status_code, 400)
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk}, format='json')
+        with override_settings(IDEMPOTENCY_TTL=0):  # the stored 400 has expired: the key is taken over
+            self.assertEqual(self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='e').status_code, 201)
+
+    def test_new_keys_delete_expired_ones(self):
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk}, format='json', HTTP_IDEMPOTENCY_KEY='old')
+        IdempotencyKey.objects.update(created=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_TTL + 1))
+        self.client.post('/api/cart/menu-items', {'menuitem_id': self.item.pk}, format='json', HTTP_IDEMPOTENCY_KEY='new')
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    # Two real requests with one key, the first still running when the second arrives
+    def setUp(self):
+        cache.clear()  # roles cached for an earlier test's user with the same pk
+        _local_tokens.clear()
+        get_store().clear()
+        customer = User.objects.create_user('customer@example.com', 'Customer', 'pass1234')
+        item = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), inventory=5)
+        CartItem.objects.create(user=customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=customer).key}')
+
+    def checkout_twice(self, release_after):
+        # (first response, duplicate's response); the first checkout is held until
+        # `release_after` seconds after the duplicate was sent
+        started, release, responses = threading.Event(), threading.Event(), []
+        slow_checkout = views.checkout
+
+        def checkout(user):
+            started.set()
+            release.wait(5)
+            return slow_checkout(user)
+
+        def first():
+            try:
+                responses.append(self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='slow'))
+            finally:
+                connection.close()  # this thread's own connection
+
+        with mock.patch.object(views, 'checkout', checkout):
+            thread = threading.Thread(target=first)
+            thread.start()
+            self.assertTrue(started.wait(5), responses and responses[0].content)
+            timer = threading.Timer(release_after, release.set)
+            timer.start()
+            duplicate = self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='slow')
+            release.set()
+            timer.cancel()
+            thread.join()
+        self.assertEqual(responses[0].status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+        return responses[0], duplicate
+
+    def test_duplicate_of_a_request_in_flight_waits_and_replays(self):
+        first, duplicate = self.checkout_twice(release_after=0.2)
+        self.assertEqual((duplicate.status_code, duplicate.content), (201, first.content))
+        self.assertEqual(duplicate['Idempotent-Replayed'], 'true')
+
+    def test_duplicate_gives_up_after_waiting(self):
+        # every poll, quickly: the wait stays within the view's query budget
+        with mock.patch.object(idempotency, 'WAIT_DELAYS', (0.01,) * len(idempotency.WAIT_DELAYS)):
+            first, duplicate = self.checkout_twice(release_after=5)
+        self.assertEqual((duplicate.status_code, duplicate['Retry-After']), (409, '1'))
+        retry = self.client.post('/api/orders', HTTP_IDEMPOTENCY_KEY='slow')
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+
+
+class QueryPlanTests(APITestCase):
+    """
+    EXPLAIN QUERY PLAN for every list endpoint's queryset on a few thousand rows:
+    a bare `SCAN <table>` (no index) or a `USE TEMP B-TREE` (a sort the index does not
+    give) fails the test. A list scoped to one user must also seek its rows: it may not SCAN
+    even an index, which walks every user's orders.
+    """
+    ORDER_LISTS = [{}, {'ordering': 'date'}, {'status': 1}, {'status': 0, 'ordering': '-date'},
+                   {'date_after': '2020-01-01T00:00:00Z', 'date_before': '2100-01-01T00:00:00Z'}]
+    MENU_LISTS = [{}, {'ordering': '-price'}, {'ordering': 'inventory'}, {'min_price': 90},
+                  {'max_inventory': 3, 'ordering': 'inventory'}, {'title': 'Dish 7'}]
+
+    def setUp(self):
+        super().setUp()
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Dish {i}', price=Decimal(i % 100), inventory=i % 50) for i in range(2000)
+        ])
+        customers = User.objects.bulk_create([User(email=f'c{i}@example.com', name=f'C{i}') for i in range(50)])
+        Order.objects.bulk_create([
+            Order(user=customers[i % 50], delivery_crew=self.crew if i % 3 else None, status=i % 2, total=10)
+            for i in range(5000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def queryset(self, view_class, user, params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = view_class(request=request, kwargs={}, format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    def assertIndexed(self, queryset, scoped=False):
+        plan = queryset.explain()
+        unindexed = [line for line in plan.splitlines()
+                     if re.search(r'\bSCAN \w+$', line.strip()) or 'USE TEMP B-TREE' in line
+                     or (scoped and re.search(r'\bSCAN\b', line))]
+        self.assertFalse(unindexed, f'{queryset.query}\n{plan}')
+
+    def test_order_lists(self):
+        for user in (self.manager, self.crew, self.customer):
+            for params in self.ORDER_LISTS:
+                with self.subTest(user=user.email, params=params):
+                    self.assertIndexed(self.queryset(OrdersView, user, params)[:50], scoped=user != self.manager)
+        self.assertIndexed(OrderItem.objects.filter(order__in=[1, 2, 3]))
+
+    def test_order_cursor_pages(self):
+        last = Order.objects.order_by('-date', '-id')[100]
+        for user in (self.manager, self.crew, self.customer):
+            queryset = self.queryset(OrdersView, user, {})
+            with self.subTest(user=user.email):
+                self.assertIndexed(queryset.filter(_after(('-date', '-id'), [last.date.isoformat(), last.id]))[:51],
+                                   scoped=user != self.manager)
+
+    def test_menu_lists(self):
+        for params in self.MENU_LISTS:
+            with self.subTest(params=params):
+                self.assertIndexed(self.queryset(MenuItemsView, self.customer, params)[:50])
+
+    def test_cart(self):
+        self.assertIndexed(CartItem.objects.filter(user=self.customer).select_related('menuitem'))
+
+    def test_order_foreign_keys_use_the_composite_indexes(self):
+        # No redundant single-column FK index for every write to maintain
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Order._meta.db_table)
+        indexed = [c['columns'] for c in constraints.values() if c['index']]
+        self.assertNotIn(['user_id'], indexed)
+        self.assertNotIn(['delivery_crew_id'], indexed)
+        self.assertIndexed(Order.objects.filter(user=self.customer))  # e.g. deleting a user
+        self.assertIndexed(Order.objects.filter(delivery_crew=self.crew))
+
+
+class OrderCursorPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        Order.objects.bulk_create([Order(user=self.customer, status=i % 2, total=i % 3) for i in range(23)])
+        self.client = self.client_for(self.manager)
+
+    def walk(self, params):
+        get_store().clear()  # throttle history
+        seen, pages = [], []
+        response = self.client.get('/api/orders', {'pagination': 'cursor', 'page_size': 4, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            seen += [row['id'] for row in response.json()['results']]
+            if not response.json()['next']:
+                return seen, pages
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(response.json()['next'])
+            self.assertFalse([q for q in queries if 'COUNT(' in q['sql']])
+
+    def test_every_ordering_visits_each_order_once(self):
+        for ordering in ('-date', 'date', 'status', '-total', 'total,-status'):
+            with self.subTest(ordering=ordering):
+                seen, pages = self.walk({'ordering': ordering})
+                expected = Order.objects.order_by(*ordering.split(','), '-id' if ordering.startswith('-') else 'id')
+                self.assertEqual(seen, list(expected.values_list('id', flat=True)))
+                self.assertNotIn('count', pages[0])
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get('/api/orders', {'pagination': 'cursor', 'page_size': 4, 'ordering': 'status'}).json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_page_numbers_stay_the_default(self):
+        self.assertEqual(self.client.get('/api/orders').json()['count'], 23)
+
+    def test_tampered_cursor_is_not_found(self):
+        paginator = DefaultCursorPagination()
+        cases = [
+            ('/api/orders', '["abc", 1]'),
+            ('/api/orders', '[{"x": 1}, 1]'),
+            ('/api/orders', '[null, null]'),
+            ('/api/orders', '[1]'),
+            ('/api/orders', '{"date": 1}'),
+            ('/api/menu-items?ordering=price', '["zz", "x"]'),
+        ]
+        for path, position in cases:
+            with self.subTest(path=path, position=position):
+                paginator.base_url = f'http://testserver{path}'
+                url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class SalesRollupTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), inventory=50)
+        self.cake = MenuItem.objects.create(title='Cake', price=Decimal('3.00'), inventory=50)
+        self.client = self.client_for(self.customer)
+        self.manager_client = self.client_for(self.manager)
+
+    def place_order(self, *lines):
+        self.client.post('/api/cart/menu-items', {'items': [
+            {'menuitem_id': item.pk, 'quantity': qty} for item, qty in lines
+        ]}, format='json')
+        return self.client.post('/api/orders').json()
+
+    def reports(self):
+        get_store().clear()  # throttle history
+        return (
+            self.manager_client.get('/api/reports/daily-revenue').json(),
+            self.manager_client.get('/api/reports/menu-items').json(),
+            self.manager_client.get('/api/reports/delivery-crew').json(),
+        )
+
+    def test_rollups_follow_checkout_and_status_changes(self):
+        first = self.place_order((self.soup, 2), (self.cake, 1))
+        self.place_order((self.cake, 4))
+        self.manager_client.patch(f'/api/orders/{first["id"]}', {'delivery_crew': self.crew.pk}, format='json')
+        self.client_for(self.crew).patch(f'/api/orders/{first["id"]}', {'status': 1}, format='json')
+
+        daily, items, crew = self.reports()
+        self.assertEqual(daily, [{'date': first['date'][:10], 'orders': 2, 'revenue': '23.00'}])
+        self.assertEqual(items, [
+            {'menuitem': self.cake.pk, 'title': 'Cake', 'units': 5, 'revenue': '15.00'},
+            {'menuitem': self.soup.pk, 'title': 'Soup', 'units': 2, 'revenue': '8.00'},
+        ])
+        self.assertEqual(crew, [{'delivery_crew': self.crew.pk, 'name': 'Crew', 'delivered': 1}])
+
+        self.manager_client.delete(f'/api/orders/{first["id"]}')
+        daily, items, crew = self.reports()
+        self.assertEqual(daily[0]['revenue'], '12.00')
+        self.assertEqual(items[0]['units'], 4)
+        self.assertEqual(crew[0]['delivered'], 0)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        order = self.place_order((self.soup, 1), (self.cake, 2))
+        self.manager_client.patch(f'/api/orders/{order["id"]}', {'delivery_crew': self.crew.pk, 'status': 1}, format='json')
+        self.place_order((self.soup, 3))
+        incremental = self.reports()
+        call_command('rebuild_rollups', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.reports(), incremental)
+
+    def test_deleting_users_and_items_keeps_history_and_matches_rebuild(self):
+        order = self.place_order((self.soup, 1), (self.cake, 2))
+        self.manager_client.patch(f'/api/orders/{order["id"]}', {'delivery_crew': self.crew.pk, 'status': 1}, format='json')
+        other = User.objects.create_user('other@example.com', 'Other', 'pass1234')
+        self.client = self.client_for(other)
+        self.place_order((self.soup, 3))
+
+        crew_id, soup_id = self.crew.pk, self.soup.pk
+        other.delete()  # cascades to their order, which leaves the rollups
+        self.crew.delete()
+        self.soup.delete()
+        incremental = self.reports()
+        daily, items, crew = incremental
+        self.assertEqual(daily[0]['orders'], 1)
+        self.assertIn({'menuitem': soup_id, 'title': 'Soup', 'units': 1, 'revenue': '4.00'}, items)
+        self.assertEqual(crew, [{'delivery_crew': crew_id, 'name': 'Crew', 'delivered': 1}])
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.reports(), incremental)
+
+    def test_reports_are_manager_only_and_validate_dates(self):
+        self.assertEqual(self.client.get('/api/reports/daily-revenue').status_code, 403)
+        self.assertEqual(self.manager_client.get('/api/reports/daily-revenue', {'date_after': 'soon'}).status_code, 400)
+
+
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        _local_tokens.clear()
+        MenuItem.objects.bulk_create([MenuItem(title=f'Dish {i}', price=Decimal(i), inventory=5) for i in range(1, 8)])
+        self.client = self.client_for(self.customer)
+        self.client.post('/api/cart/menu-items', {'items': [{'menuitem_id': 1}, {'menuitem_id': 2, 'quantity': 3}]}, format='json')
+        self.order = self.client.post('/api/orders').json()
+        self.client.post('/api/cart/menu-items', {'menuitem_id': 3}, format='json')
+        self.tokens = {user.pk: Token.objects.create(user=user).key for user in (self.customer, self.crew, self.manager)}
+
+    async def aget(self, view_class, user, path, params=None, **kwargs):
+        request = AsyncRequestFactory().get(path, params or {}, headers={'Authorization': f'Token {self.tokens[user.pk]}'})
+        return await view_class.as_view()(request, **kwargs)
+
+    def sync_get(self, user, path, params=None):
+        cache.clear()
+        get_store().clear()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.tokens[user.pk]}')
+        return client.get(path, params or {})
+
+    async def test_responses_match_the_sync_views(self):
+        cases = [
+            (async_views.MenuItemsView, self.customer, '/api/menu-items', {'ordering': '-price', 'page_size': 3}, {}),
+            (async_views.SingleMenuItemView, self.customer, '/api/menu-items/2', None, {'pk': 2}),
+            (async_views.CartView, self.customer, '/api/cart/menu-items', None, {}),
+            (async_views.OrdersView, self.manager, '/api/orders', {'pagination': 'cursor'}, {}),
+            (async_views.OrdersView, self.customer, '/api/orders', None, {}),
+            (async_views.SingleOrderView, self.customer, f'/api/orders/{self.order["id"]}', None, {'pk': self.order['id']}),
+            (async_views.SingleOrderView, self.crew, f'/api/orders/{self.order["id"]}', None, {'pk': self.order['id']}),
+            (async_views.SingleOrderView, self.customer, f'/api/orders/{self.order["id"]}', {'fields': 'id,total'},
+             {'pk': self.order['id']}),
+            (async_views.OrdersView, self.manager, '/api/orders', {'fields': 'id,status', 'expand': 'order_items'}, {}),
+            (async_views.SingleOrderView, self.customer, '/api/orders/999', None, {'pk': 999}),
+            (async_views.CartView, self.manager, '/api/cart/menu-items', None, {}),
+        ]
+        for view_class, user, path, params, kwargs in cases:
+            with self.subTest(path=path, user=user.email):
+                expected = await sync_to_async(self.sync_get)(user, path, params)
+                await cache.aclear()
+                response = await self.aget(view_class, user, path, params, **kwargs)
+                self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+
+    async def test_unauthenticated_and_throttled(self):
+        response = await async_views.OrdersView.as_view()(AsyncRequestFactory().get('/api/orders'))
+        self.assertEqual((response.status_code, response['WWW-Authenticate']), (401, 'Token'))
+        for _ in range(10):
+            await self.aget(async_views.OrdersView, self.customer, '/api/orders')
+        response = await self.aget(async_views.OrdersView, self.customer, '/api/orders')
+        self.assertEqual(response.status_code, 429)
+
+    async def test_ndjson_stream(self):
+        response = await self.aget(async_views.MenuItemsView, self.customer, '/api/menu-items', {'stream': 'ndjson'})
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(b''.join(lines).splitlines()), 7)
+
+
+class ProductionSQLiteTests(SimpleTestCase):
+    # Parallel read-then-write transactions on one file, each thread with its own connection
+    WRITERS, READERS, TRANSACTIONS = 8, 4, 25
+
+    def connect(self, name, init_command=''):
+        settings_dict = dict(connections['default'].settings_dict, NAME=name, ENGINE='littlelemon.db', OPTIONS={
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;PRAGMA mmap_size=268435456;' + init_command,
+        })
+        return load_backend('littlelemon.db').DatabaseWrapper(settings_dict, alias='stress')
+
+    def test_parallel_writers_and_readers(self):
+        name = tempfile.mkdtemp() + '/stress.sqlite3'
+        setup = self.connect(name)
+        with setup.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, n INTEGER NOT NULL)')
+            cursor.execute('INSERT INTO counter VALUES (1, 0)')
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        setup.close()
+
+        errors, reads = [], []
+
+        def writer():
+            conn = self.connect(name)
+            try:
+                for _ in range(self.TRANSACTIONS):
+                    # What transaction.atomic() does: BEGIN, read, write, COMMIT
+                    conn.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                    with conn.cursor() as cursor:
+                        n = cursor.execute('SELECT n FROM counter WHERE id = 1').fetchone()[0]
+                        cursor.execute('UPDATE counter SET n = %s WHERE id = 1', [n + 1])
+                    conn.commit()
+                    conn.set_autocommit(True)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                conn.close()
+
+        def reader():
+            conn = self.connect(name)
+            try:
+                for _ in range(self.TRANSACTIONS * 2):
+                    with conn.cursor() as cursor:
+                        reads.append(cursor.execute('SELECT n FROM counter').fetchone()[0])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(self.WRITERS)]
+        threads += [threading.Thread(target=reader) for _ in range(self.READERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(reads), self.READERS * self.TRANSACTIONS * 2)
+        check = self.connect(name)
+        with check.cursor() as cursor:
+            self.assertEqual(cursor.execute('SELECT n FROM counter').fetchone()[0], self.WRITERS * self.TRANSACTIONS)
+        check.close()
+
+    def test_autocommit_writes_queue_with_transactions(self):
+        # No busy timeout: two writers meeting inside SQLite fail at once, so every write,
+        # in a transaction or not, has to be serialized by the writer lock
+        name = tempfile.mkdtemp() + '/autocommit.sqlite3'
+        setup = self.connect(name)
+        with setup.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, n INTEGER NOT NULL)')
+            cursor.execute('INSERT INTO counter VALUES (1, 0)')
+        setup.close()
+        errors = []
+
+        def writer(in_transaction):
+            conn = self.connect(name, init_command='PRAGMA busy_timeout=0;')
+            try:
+                for _ in range(self.TRANSACTIONS):
+                    if in_transaction:
+                        conn.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                    with conn.cursor() as cursor:
+                        cursor.execute('UPDATE counter SET n = n + 1 WHERE id = 1')  # a plain save() when autocommit
+                    if in_transaction:
+                        conn.commit()
+                        conn.set_autocommit(True)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=writer, args=(n % 2 == 0,)) for n in range(self.WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        check = self.connect(name)
+        with check.cursor() as cursor:
+            self.assertEqual(cursor.execute('SELECT n FROM counter').fetchone()[0], self.WRITERS * self.TRANSACTIONS)
+        check.close()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        get_store().clear()  # client pins
+        self.router = PrimaryReplicaRouter()
+        self.factory = APIRequestFactory()
+
+    def route(self, method, token, write=False):
+        # Run a request through the middleware; report where a read after the view's work goes
+        def view(request):
+            if write:
+                self.router.db_for_write(MenuItem)
+            return SimpleNamespace(read=self.router.db_for_read(MenuItem))
+        request = getattr(self.factory, method)('/api/menu-items', HTTP_AUTHORIZATION=f'Token {token}')
+        return ReadYourWritesMiddleware(view)(request).read
+
+    def test_reads_go_to_replica_until_the_client_writes(self):
+        self.assertEqual(self.route('get', 'a'), 'replica1')
+        self.assertEqual(self.route('post', 'a'), 'default')  # write request: pinned from the start
+        self.assertEqual(self.route('get', 'a'), 'default')   # same client, within REPLICA_PIN_SECONDS
+        self.assertEqual(self.route('get', 'b'), 'replica1')  # other clients are unaffected
+
+    def test_client_pin_is_seen_by_every_worker(self):
+        self.assertEqual(self.route('post', 'e'), 'default')
+        cache.clear()  # another worker: its own LocMem cache and its own store connection
+        with mock.patch.object(throttling, '_stores', {}):
+            self.assertEqual(self.route('get', 'e'), 'default')
+            self.assertEqual(self.route('get', 'f'), 'replica1')
+
+    def test_read_after_write_in_same_request_uses_primary(self):
+        self.assertEqual(self.route('get', 'c', write=True), 'default')
+        self.assertEqual(self.route('get', 'c'), 'default')
+        self.assertEqual(self.router.db_for_write(MenuItem), 'default')
+
+    def test_writes_outside_a_request_pin_nothing(self):
+        # e.g. a management command: one write must not send the thread's later reads to the primary
+        self.assertEqual(self.router.db_for_write(MenuItem), 'default')
+        self.assertEqual(self.router.db_for_read(MenuItem), 'replica1')
+        self.assertEqual(self.route('get', 'd'), 'replica1')
+        with primary_reads():
+            self.assertEqual(self.router.db_for_read(MenuItem), 'default')
+
+    def test_copy_database_brings_replica_up_to_date(self):
+        directory = tempfile.mkdtemp()
+        settings_dict = dict(connections['default'].settings_dict, NAME=f'{directory}/primary.sqlite3', OPTIONS={})
+        primary = load_backend('django.db.backends.sqlite3').DatabaseWrapper(settings_dict, alias='primary')
+        with primary.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+            cursor.execute('INSERT INTO item VALUES (1), (2)')
+        copy_database(primary, f'{directory}/replica.sqlite3')
+        primary.close()
+        replica = load_backend('django.db.backends.sqlite3').DatabaseWrapper(
+            dict(settings_dict, NAME=f'{directory}/replica.sqlite3'), alias='replica')
+        with replica.cursor() as cursor:
+            self.assertEqual(cursor.execute('SELECT count(*) FROM item').fetchone()[0], 2)
+        replica.close()
+
+
+class SlidingWindowThrottleTests(SimpleTestCase):
+    def setUp(self):
+        get_store().clear()
+        self.view = SimpleNamespace(throttle_scope='orders')  # 10/minute
+        self.request = Request(APIRequestFactory().get('/api/orders'))
+        self.request.user = SimpleNamespace(is_authenticated=True, pk=1)
+
+    def check(self, now):
+        throttle = ScopedRateThrottle()
+        throttle.timer = lambda: now
+        return throttle.allow_request(self.request, self.view), throttle
+
+    def test_limit_and_sliding_window(self):
+        start = 600 * 60  # start of a window
+        self.assertEqual([self.check(start + i)[0] for i in range(11)], [True] * 10 + [False])
+        allowed, throttle = self.check(start + 30)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 30 + 6)  # window end, then 1/10 of the next for 10 -> 9
+        # Half-way through the next window the previous one still weighs 5 requests
+        self.assertEqual([self.check(start + 90)[0] for _ in range(6)], [True] * 5 + [False])
+
+    def test_store_is_shared_by_every_worker(self):
+        with override_settings(THROTTLE_STORE=None):
+            self.assertIsInstance(get_store(), SQLiteCounterStore)  # LocMem is per process
+            self.assertTrue(get_store().path.endswith('throttle.sqlite3'))
+            redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+            with override_settings(CACHES=redis):
+                self.assertIsInstance(get_store(), CacheCounterStore)
+
+    def test_sqlite_store_counts_exactly_across_connections(self):
+        path = tempfile.mkdtemp() + '/throttle.sqlite3'
+
+        def worker():
+            store = SQLiteCounterStore(path)  # own connection, like another worker process
+            for _ in range(50):
+                store.incr('k', 1, 60)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SQLiteCounterStore(path).get('k'), 400)
+
+
+class FastPathContractTests(APITestCase):
+    # The serializer-free list path must render exactly what the serializers would
+    def setUp(self):
+        super().setUp()
+        self.items = MenuItem.objects.bulk_create([
+            MenuItem(title='Soup', price=Decimal('4.5'), inventory=3),
+            MenuItem(title='Café \u2028 crème', price=Decimal('12.00'), inventory=0),
+            MenuItem(title='"Quoted" \\ slash', price=Decimal('0.99'), inventory=7),
+        ])
+        for n, user in enumerate([self.customer, self.customer, self.manager]):
+            order = Order.objects.create(user=user, delivery_crew=self.crew if n else None, status=n % 2,
+                                         total=Decimal('17.49'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menuitem=item, quantity=n + 1, unit_price=item.price, price=item.price * (n + 1))
+                for item in reversed(self.items)
+            ])
+        self.orders = Order.objects.order_by('-date', '-id')
+
+    def assertSameBytes(self, data, expected):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_menu_items(self):
+        queryset = MenuItem.objects.order_by('id')
+        self.assertSameBytes(fastpath.menu_items(queryset.values(*fastpath.menu_item_row.sources)),
+                             MenuItemSerializer(queryset, many=True).data)
+
+    def test_orders_with_grouped_lines(self):
+        rows = self.orders.values(*fastpath.order_row.sources)
+        with self.assertNumQueries(2):
+            data = fastpath.orders(rows)
+        expected = OrderSerializer(OrdersView(request=SimpleNamespace(user=self.manager)).get_queryset()
+                                   .order_by('-date', '-id'), many=True).data
+        self.assertSameBytes(data, expected)
+
+    def test_list_endpoints(self):
+        client = self.client_for(self.manager)
+        response = client.get('/api/orders', {'page_size': 50})
+        expected = OrderSerializer(OrdersView(request=SimpleNamespace(user=self.manager)).get_queryset()
+                                   .order_by('-date'), many=True)
+        self.assertEqual(response.content, JSONRenderer().render(
+            {'count': 3, 'next': None, 'previous': None, 'results': expected.data}))
+        response = client.get('/api/menu-items', {'page_size': 50, 'ordering': 'price'})
+        expected = MenuItemSerializer(MenuItem.objects.order_by('price'), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(
+            {'count': 3, 'next': None, 'previous': None, 'results': expected}))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {'a': ['\u2028\u2029', 'é', 1.5, None, True], 1: Decimal('1.10'), 'when': self.orders[0].date}
+        self.assertSameBytes(data, data)
+
+
+class SparseOrderFieldsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        item = MenuItem.objects.create(title='Soup', price=Decimal('4.00'), inventory=50)
+        for _ in range(3):
+            order = Order.objects.create(user=self.customer, delivery_crew=self.crew, total=Decimal('8.00'))
+            OrderItem.objects.create(order=order, menuitem=item, quantity=2, unit_price=item.price, price=Decimal('8.00'))
+        self.order = order
+        self.client = self.client_for(self.manager)
+
+    def get(self, path, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), ' '.join(q['sql'] for q in queries)
+
+    def test_fields_skip_the_lines(self):
+        data, sql = self.get('/api/orders', {'fields': 'id,status,total'})
+        self.assertEqual([list(order) for order in data['results']], [['id', 'status', 'total']] * 3)
+        self.assertNotIn('littlelemon_orderitem', sql)
+
+        data, sql = self.get(f'/api/orders/{self.order.pk}', {'fields': 'status'})
+        self.assertEqual(data, {'status': 0})
+        self.assertNotIn('littlelemon_orderitem', sql)
+        self.assertNotIn('"total"', sql)  # only the requested columns are loaded
+
+    def test_expand(self):
+        data, sql = self.get('/api/orders', {'fields': 'id', 'expand': 'order_items'})
+        self.assertEqual(list(data['results'][0]), ['id', 'order_items'])
+        self.assertEqual(data['results'][0]['order_items'][0]['title'], 'Soup')
+        data, _ = self.get('/api/orders', {'expand': ''})
+        self.assertNotIn('order_items', data['results'][0])
+        self.assertIn('delivery_crew', data['results'][0])
+        data, _ = self.get(f'/api/orders/{self.order.pk}', {})
+        self.assertEqual(len(data['order_items']), 1)  # no parameters: the full order, as before
+
+    def test_cursor_pages_without_the_ordering_field(self):
+        data, _ = self.get('/api/orders', {'fields': 'id', 'pagination': 'cursor', 'page_size': 2})
+        get_store().clear()
+        rest, _ = self.get(data['next'], {})
+        self.assertEqual([o['id'] for o in data['results'] + rest['results']],
+                         list(Order.objects.order_by('-date').values_list('id', flat=True)))
+
+    def test_unknown_names_are_rejected(self):
+        self.assertEqual(self.client.get('/api/orders', {'fields': 'id,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/orders/{self.order.pk}', {'expand': 'user'}).status_code, 400)
+
+
+class OrderExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        soup = MenuItem.objects.create(title='Soup, "hot"', price=Decimal('4.00'), inventory=50)
+        cake = MenuItem.objects.create(title='Cake', price=Decimal('3.00'), inventory=50)
+        self.orders = Order.objects.bulk_create([
+            Order(user=self.customer, delivery_crew=self.crew, total=Decimal('11.00')) for _ in range(5)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=item, quantity=q, unit_price=item.price, price=item.price * q)
+            for order in self.orders[:4] for item, q in ((soup, 2), (cake, 1))
+        ])  # the last order has no lines
+        # Equal dates across chunk boundaries: the keyset must fall back to id
+        Order.objects.filter(pk__in=[o.pk for o in self.orders[:3]]).update(date=datetime(2025, 8, 1, 12, tzinfo=dt_timezone.utc))
+        Order.objects.filter(pk=self.orders[3].pk).update(date=datetime(2025, 7, 1, 12, tzinfo=dt_timezone.utc))
+        self.client = self.client_for(self.manager)
+
+    def export(self, params):
+        response = self.client.get('/api/orders/export', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_orders_match_the_orders_api_oldest_first(self):
+        expected = {o['id']: o for o in self.client.get('/api/orders', {'page_size': 50}).json()['results']}
+        with mock.patch.object(order_export, 'EXPORT_CHUNK_SIZE', 2):
+            exported = [json.loads(line) for line in self.export({'format': 'ndjson'}).splitlines()]
+        ids = [o.pk for o in self.orders]
+        self.assertEqual([o['id'] for o in exported], [ids[3], ids[0], ids[1], ids[2], ids[4]])
+        self.assertEqual(exported, [expected[o['id']] for o in exported])
+
+    def test_two_queries_per_chunk_while_streaming(self):
+        with mock.patch.object(order_export, 'EXPORT_CHUNK_SIZE', 2):
+            response = self.client.get('/api/orders/export', {'format': 'ndjson'})
+            with CaptureQueriesContext(connection) as queries:
+                b''.join(response.streaming_content)
+        self.assertEqual(len(queries), 2 * 3)  # 5 orders: chunks of 2, 2 and 1
+
+    def test_csv_has_a_row_per_line_within_the_date_range(self):
+        with mock.patch.object(order_export, 'EXPORT_CHUNK_SIZE', 2):
+            text = self.export({'format': 'csv', 'date_after': '2025-07-15', 'date_before': '2025-08-31'})
+        rows = list(csv.reader(StringIO(text)))
+        self.assertEqual(rows[0], order_export.CSV_HEADER)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [o.pk for o in self.orders[:3] for _ in range(2)])
+        self.assertEqual(rows[1][1:], ['2025-08-01T12:00:00Z', str(self.customer.pk), str(self.crew.pk), '0',
+                                       '11.00', rows[1][6], rows[1][7], 'Soup, "hot"', '2', '4.00', '8.00'])
+
+        rows = list(csv.reader(StringIO(self.export({'format': 'csv', 'status': 0}))))
+        self.assertEqual(rows[-1][:6], [str(self.orders[4].pk), rows[-1][1], str(self.customer.pk), str(self.crew.pk),
+                                        '0', '11.00'])
+        self.assertEqual(rows[-1][6:], [''] * 6)  # an order without lines still gets a row
+
+    def test_managers_only_and_valid_dates(self):
+        self.assertEqual(self.client_for(self.crew).get('/api/orders/export').status_code, 403)
+        response = self.client.get('/api/orders/export', {'format': 'csv', 'date_after': 'last month'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date_after', json.loads(response.content))  # JSON text, whatever the format
+
+    async def test_async_lines_match(self):
+        queryset = Order.objects.all()
+        with mock.patch.object(order_export, 'EXPORT_CHUNK_SIZE', 2):
+            for file_format in ('csv', 'ndjson'):
+                expected = await sync_to_async(lambda: list(order_export.export_lines(queryset, file_format)))()
+                lines = [line async for line in order_export.export_lines(queryset, file_format, asynchronous=True)]
+                self.assertEqual(lines, expected)
+
+
+class DispatchTests(APITestCase):
+    def test_plan_fills_the_least_loaded_first(self):
+        assignments = plan(range(1, 7), {10: 3, 11: 0, 12: 1}, capacity=4)
+        self.assertEqual(dict(assignments), {11: [1, 2, 4], 12: [3, 5], 10: [6]})
+        self.assertEqual(dict(plan(range(1, 4), {10: 2}, capacity=2)), {})
+
+    def test_endpoint_assigns_in_one_update(self):
+        other = User.objects.create_user('crew2@example.com', 'Crew 2')
+        other.groups.add(self.crew_group)
+        Order.objects.create(user=self.customer, delivery_crew=self.crew, total=Decimal('1.00'))  # open load
+        orders = Order.objects.bulk_create([Order(user=self.customer, total=Decimal('1.00')) for _ in range(5)])
+        self.assertEqual(self.client_for(self.customer).post('/api/orders/dispatch').status_code, 403)
+
+        client = self.client_for(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/orders/dispatch', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'assigned': 5, 'unassigned': 0,
+                                           'crew': {str(other.pk): 3, str(self.crew.pk): 2}})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+        self.assertFalse(Order.objects.filter(pk__in=[o.pk for o in orders], delivery_crew=None).exists())
+        self.assertEqual(client.post('/api/orders/dispatch', {'capacity': 0}, format='json').status_code, 400)
+
+
+    def test_orders_taken_meanwhile_are_not_reported(self):
+        orders = Order.objects.bulk_create([Order(user=self.customer, total=Decimal('1.00')) for _ in range(3)])
+        taken = orders[1]
+
+        def plan_while_a_manager_assigns_one(*args):
+            Order.objects.filter(pk=taken.pk).update(delivery_crew=self.manager)
+            return plan(*args)
+
+        with mock.patch.object(dispatch, 'plan', plan_while_a_manager_assigns_one), \
+                mock.patch.object(dispatch, 'publish_order_events') as publish:
+            result = dispatch.dispatch()
+        self.assertEqual(result, {'assigned': 2, 'unassigned': 1, 'crew': {self.crew.pk: 2}})
+        self.assertEqual([event['id'] for event in publish.call_args.args[0]], [orders[0].pk, orders[2].pk])
+        self.assertEqual(Order.objects.get(pk=taken.pk).delivery_crew, self.manager)
+
+
+class BulkOrderUpdateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_crew = User.objects.create_user('crew2@example.com', 'Crew 2')
+        self.other_crew.groups.add(self.crew_group)
+        self.mine = Order.objects.create(user=self.customer, delivery_crew=self.crew, total=Decimal('1.00'))
+        self.theirs = Order.objects.create(user=self.customer, delivery_crew=self.other_crew, total=Decimal('1.00'))
+        self.unassigned = Order.objects.create(user=self.customer, total=Decimal('1.00'))
+
+    def patch(self, user, body):
+        return self.client_for(user).patch('/api/orders/bulk', body, format='json')
+
+    def test_manager_updates_many_orders_in_one_statement(self):
+        ids = [self.mine.pk, self.theirs.pk, self.unassigned.pk, 999, self.mine.pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(self.manager, {'ids': ids, 'status': 1, 'delivery_crew': self.crew.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'updated': 3, 'results': [
+            {'id': self.mine.pk, 'result': 'updated'},
+            {'id': self.theirs.pk, 'result': 'updated'},
+            {'id': self.unassigned.pk, 'result': 'updated'},
+            {'id': 999, 'result': 'not_found'},
+        ]})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "littlelemon_order"')]), 1)
+        self.assertEqual(Order.objects.filter(delivery_crew=self.crew, status=1).count(), 3)
+        self.assertEqual(DeliveryCrewStats.objects.get(delivery_crew=self.crew).delivered, 3)
+
+    def test_delivery_crew_only_touches_own_orders(self):
+        response = self.patch(self.crew, {'ids': [self.mine.pk, self.theirs.pk], 'status': 1})
+        self.assertEqual(response.json()['results'], [
+            {'id': self.mine.pk, 'result': 'updated'}, {'id': self.theirs.pk, 'result': 'forbidden'}])
+        self.assertEqual(list(Order.objects.filter(status=1)), [self.mine])
+        self.assertEqual(self.patch(self.crew, {'ids': [self.mine.pk], 'delivery_crew': None}).status_code, 403)
+        self.assertEqual(self.patch(self.customer, {'ids': [self.mine.pk], 'status': 1}).status_code, 403)
+        self.assertEqual(self.patch(self.manager, {'ids': [self.mine.pk]}).status_code, 400)
+
+    def test_anonymous_callers_must_authenticate(self):
+        response = APIClient().patch('/api/orders/bulk', {'ids': [self.mine.pk], 'status': 1}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(Order.objects.filter(status=1).count(), 0)
+
+
+class OrderEventsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        _local_tokens.clear()
+        self.order = Order.objects.create(user=self.customer, delivery_crew=self.crew, total=Decimal('1.00'))
+        self.tokens = {user.pk: Token.objects.create(user=user).key for user in (self.customer, self.manager)}
+
+    async def subscribe(self, user, params=None):
+        request = AsyncRequestFactory().get('/api/orders/events', params or {},
+                                            headers={'Authorization': f'Token {self.tokens[user.pk]}'})
+        response = await async_views.OrderEventsView.as_view()(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        return stream
+
+    async def next_event(self, stream):
+        chunk = (await asyncio.wait_for(anext(stream), 2)).decode()
+        fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+        return fields['event'], json.loads(fields['data'])
+
+    def manager_patch(self, body):
+        client = self.client_for(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.patch(f'/api/orders/{self.order.pk}', body, format='json').status_code, 200)
+
+    async def test_subscriber_gets_changes_to_visible_orders_only(self):
+        stream = await self.subscribe(self.customer)
+        other = order_event('order.updated', 999, self.manager.pk, None, 1)
+        get_broker().publish([other])  # someone else's order: filtered out
+        await sync_to_async(self.manager_patch)({'status': 1})
+        self.assertEqual(await self.next_event(stream), ('order.updated', {
+            'id': self.order.pk, 'user': self.customer.pk, 'delivery_crew': self.crew.pk,
+            'previous_delivery_crew': self.crew.pk, 'status': 1,
+        }))
+
+        # A manager sees every order; ?order= narrows the stream to one
+        stream = await self.subscribe(self.manager, {'order': self.order.pk})
+        get_broker().publish([other])
+        await sync_to_async(self.manager_patch)({'delivery_crew': None})
+        event, data = await self.next_event(stream)
+        self.assertEqual((data['id'], data['delivery_crew'], data['previous_delivery_crew']),
+                         (self.order.pk, None, self.crew.pk))
+
+    async def test_slow_subscriber_is_disconnected(self):
+        with override_settings(ORDER_EVENTS_QUEUE_SIZE=2):
+            broker = LocalBroker()
+            subscription = broker.subscribe()
+        broker.publish([order_event('order.updated', n, 1, None, 0) for n in range(3)])
+        await asyncio.sleep(0)
+        with self.assertRaises(Overflow):
+            await subscription.get(1)
+        subscription.close()
+        self.assertEqual(broker.subscribers, set())
+
+    def test_wsgi_is_told_to_use_asgi(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.tokens[self.customer.pk]}')
+        self.assertEqual(client.get('/api/orders/events').status_code, 501)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seed_then_benchmark_every_route(self):
+        call_command('seed_data', managers=1, crew=2, customers=5, menu_items=6, carts=2, cart_lines=2,
+                     orders=30, days=3, stdout=StringIO())
+        self.assertEqual(User.objects.filter(groups__name='Delivery crew').count(), 2)
+        self.assertEqual(CartItem.objects.count(), 4)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(sum(DailySales.objects.values_list('orders', flat=True)), 30)
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('bench_endpoints', requests=2, warmup=0, output=output.name, stdout=StringIO())
+            results = json.load(output)
+        self.assertEqual(results['meta']['not_covered'], [])
+        self.assertEqual({name: row['error'] for name, row in results['endpoints'].items() if row['error']}, {})
+        self.assertEqual(results['endpoints']['GET /api/orders']['requests'], 2)
+        self.assertEqual(Order.objects.count(), 30)  # the runner's own rows are gone
+        self.assertEqual(sum(DailySales.objects.values_list('orders', flat=True)), 30)
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+
+    def test_server_timing_counts_the_requests_queries(self):
+        Order.objects.create(user=self.customer, total=Decimal('1.00'))
+        client = self.client_for(self.customer)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/orders')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_manager_only_prometheus_endpoint(self):
+        self.client_for(self.customer).get('/api/orders')
+        self.assertEqual(self.client_for(self.customer).get('/api/metrics').status_code, 403)
+
+        response = self.client_for(self.manager).get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_db_queries_count{view="OrdersView",method="GET"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="OrdersView",method="GET",le="+Inf"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="MetricsView",method="GET"} 1', text)  # the 403
+
+    def test_unknown_methods_share_one_series(self):
+        client = self.client_for(self.customer)
+        for method in ('BREW', 'WHEN', 'PURGE'):
+            client.generic(method, '/api/orders')
+        text = metrics.registry.exposition()
+        self.assertIn('http_request_duration_seconds_count{view="OrdersView",method="other"} 3', text)
+        self.assertEqual(len(metrics.registry.series), 1)
+
+    def test_streamed_queries_are_measured_and_budgeted(self):
+        Order.objects.bulk_create([Order(user=self.customer, total=Decimal('1.00')) for _ in range(3)])
+        client = self.client_for(self.manager)
+        with mock.patch.object(order_export, 'EXPORT_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/orders/export', {'format': 'ndjson'})
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn(f'http_request_db_queries_sum{{view="OrderExportView",method="GET"}} {len(queries)}',
+                      metrics.registry.exposition())
+
+        with mock.patch.object(views.OrderExportView, 'query_budget', {'GET': 1}):
+            response = client.get('/api/orders/export', {'format': 'ndjson'})
+            self.assertEqual(response.status_code, 200)  # sent before the stream ran its queries
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                b''.join(response.streaming_content)
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Every endpoint at two data sizes: the number of queries must not grow with the data,
+    and RequestMetricsMiddleware raises if a request goes over its view's query_budget.
+    """
+    def setUp(self):
+        super().setUp()
+        self.target = User.objects.create_user('target@example.com', 'Target')
+
+    def populate(self, size):
+        tag = f'size{size}'
+        items = MenuItem.objects.bulk_create([
+            MenuItem(title=f'{tag} {i}', price=Decimal('2.00'), inventory=10 ** 6) for i in range(size)
+        ])
+        staff = User.objects.bulk_create([User(email=f'{tag}-{i}@example.com', name=tag) for i in range(size)])
+        self.manager_group.user_set.add(*staff)
+        self.crew_group.user_set.add(*staff)
+        orders = Order.objects.bulk_create([
+            Order(user=self.customer, delivery_crew=self.crew, total=Decimal('2.00') * size) for _ in range(size)
+        ])
+        self.add_lines(orders, items)
+        self.fill_cart(items)
+        rollups.rebuild(Order.objects.all())
+        return items, orders
+
+    def add_lines(self, orders, items):
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for order in orders for item in items
+        ])
+
+    def fill_cart(self, items):
+        CartItem.objects.filter(user=self.customer).delete()
+        CartItem.objects.bulk_create([
+            CartItem(user=self.customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for item in items
+        ])
+
+    def requests(self, items, orders):
+        # (method, path or setup -> path, user, body)
+        def new_order():
+            order = Order.objects.create(user=self.customer, delivery_crew=self.crew)
+            self.add_lines([order], items)
+            return f'/api/orders/{order.pk}'
+
+        def unassigned_orders():
+            Order.objects.bulk_create([Order(user=self.customer) for _ in items])
+            return '/api/orders/dispatch'
+
+        export = 'title,price,inventory\n' + ''.join(f'{i.title},3.00,{10 ** 6}\n' for i in items)
+        item, order, lines = items[0].pk, orders[0].pk, [{'menuitem_id': i.pk, 'quantity': 1} for i in items]
+        return [
+            ('GET', '/api/menu-items?page_size=50', self.customer, None),
+            ('POST', '/api/menu-items', self.manager, {'title': f'New {len(items)}', 'price': '1.00', 'inventory': 1}),
+            ('GET', f'/api/menu-items/{item}', self.customer, None),
+            ('PUT', f'/api/menu-items/{item}', self.manager, {'title': f'Put {len(items)}', 'price': '2.00', 'inventory': 10 ** 6}),
+            ('PATCH', f'/api/menu-items/{item}', self.manager, {'price': '2.00'}),
+            ('DELETE', lambda: f'/api/menu-items/{MenuItem.objects.create(title="Gone", price=1, inventory=1).pk}',
+             self.manager, None),
+            ('GET', '/api/menu-items/bulk?format=csv', self.manager, None),
+            ('POST', '/api/menu-items/bulk', self.manager, export),
+            ('GET', '/api/groups/manager/users', self.manager, None),
+            ('POST', '/api/groups/manager/users', self.manager, {'user_id': self.target.pk}),
+            ('DELETE', f'/api/groups/manager/users/{self.target.pk}', self.manager, None),
+            ('GET', '/api/groups/delivery-crew/users', self.manager, None),
+            ('POST', '/api/groups/delivery-crew/users', self.manager, {'user_id': self.target.pk}),
+            ('DELETE', f'/api/groups/delivery-crew/users/{self.target.pk}', self.manager, None),
+            ('GET', '/api/cart/menu-items', self.customer, None),
+            ('POST', '/api/cart/menu-items', self.customer, {'menuitem_id': item, 'quantity': 1}),
+            ('POST', '/api/cart/menu-items', self.customer, {'items': lines}),
+            ('DELETE', '/api/cart/menu-items', self.customer, None),
+            ('GET', '/api/orders?page_size=50', self.customer, None),
+            ('GET', '/api/orders?page_size=50', self.crew, None),
+            ('GET', '/api/orders?page_size=50', self.manager, None),
+            ('GET', '/api/orders?page_size=50&fields=id,total,order_items', self.manager, None),
+            ('POST', lambda: self.fill_cart(items) or '/api/orders', self.customer, None),
+            ('GET', f'/api/orders/{order}', self.customer, None),
+            ('GET', f'/api/orders/{order}', self.crew, None),
+            ('PATCH', f'/api/orders/{order}', self.crew, {'status': 1}),
+            ('PUT', f'/api/orders/{order}', self.manager, {'delivery_crew': self.crew.pk, 'status': 0}),
+            ('PATCH', f'/api/orders/{order}', self.manager, {'status': 1, 'delivery_crew': self.crew.pk}),
+            ('DELETE', new_order, self.manager, None),
+            ('PATCH', '/api/orders/bulk', self.manager, {'ids': [o.pk for o in orders], 'status': 0, 'delivery_crew': self.crew.pk}),
+            ('POST', unassigned_orders, self.manager, {}),
+            ('GET', '/api/orders/export?format=csv', self.manager, None),
+            ('GET', '/api/reports/daily-revenue', self.manager, None),
+            ('GET', '/api/reports/menu-items', self.manager, None),
+            ('GET', '/api/reports/delivery-crew', self.manager, None),
+            ('GET', '/api/metrics', self.manager, None),
+        ]
+
+    def measure(self, size):
+        counts = {}
+        for i, (method, path, user, body) in enumerate(self.requests(*self.populate(size))):
+            path = path() if callable(path) else path
+            cache.clear()  # cold token, role and menu caches: the worst case
+            get_store().clear()
+            _local_tokens.clear()
+            client = APIClient(HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=user)[0].key}')
+            options = {'content_type': 'text/csv'} if isinstance(body, str) else {'format': 'json'}
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method.lower())(path, body, **options)
+                if response.streaming:
+                    b''.join(response.streaming_content)  # exports query as they stream
+            self.assertLess(response.status_code, 300, f'{method} {path}: {getattr(response, "content", None)}')
+            counts[f'{i}. {method} {re.sub(r"/[0-9]+", "/<pk>", path)} as {user.name}'] = len(queries)
+        return counts
+
+    def test_query_counts_do_not_grow_with_the_data(self):
+        small = self.measure(2)
+        self.assertEqual(small, self.measure(25))
+
+    def test_every_view_declares_budgets(self):
+        for pattern in urls.urlpatterns:
+            view = metrics.resolved_view(SimpleNamespace(resolver_match=SimpleNamespace(func=pattern.callback)))
+            for method in view.http_method_names:
+                if method not in ('head', 'options') and hasattr(view, method):
+                    with self.subTest(view=view.__name__, method=method):
+                        self.assertIn(method.upper(), getattr(view, 'query_budget', {}))
+
+    @override_settings(DEBUG=False)  # enforced by the test settings, not by DEBUG
+    def test_over_budget_raises_with_the_sql(self):
+        Order.objects.create(user=self.customer)
+        with mock.patch.object(OrdersView, 'query_budget', {'GET': 1}):
+            with self.assertRaisesRegex(metrics.QueryBudgetExceeded, r'OrdersView GET: \d+ queries, budget 1\n1\. SELECT'):
+                self.client_for(self.customer).get('/api/orders')
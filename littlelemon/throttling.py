@@ -0,0 +1,204 @@
+"""
+Sliding-window counter throttles backed by a shared counter store.
+
+DRF's stock throttles keep a list of request timestamps per client in the cache and rewrite
+it on every request: O(rate) work, and a lost update whenever two workers race. Here each
+client has one counter per fixed window, bumped with an atomic increment, and the rate is
+estimated from the current and previous window:
+
+    count = previous * (1 - elapsed / duration) + current
+
+Two keys per check whatever the rate. Scopes and rates are DRF's (DEFAULT_THROTTLE_RATES).
+The counters must be shared by every worker, or each one enforces the whole rate on its own.
+They live in the default cache when that is Redis or Memcached (add/incr are atomic there),
+otherwise in a SQLite table (THROTTLE_STORE, or throttle.sqlite3 next to manage.py) shared by
+every worker on the host. LocMem is per process, and the file cache's incr is a get then a
+set that races between processes, so neither is used for counters.
+"""
+import random
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import throttling
+
+
+class CacheCounterStore:
+    # Only for caches every worker shares and increments atomically (SHARED_CACHE_BACKENDS)
+    def incr(self, key, delta, timeout):
+        while True:
+            if cache.add(key, delta, timeout):
+                return delta
+            try:
+                return cache.incr(key, delta)
+            except ValueError:  # expired between add() and incr(); start it again
+                continue
+
+    def get(self, key):
+        return cache.get(key, 0)
+
+    async def aincr(self, key, delta, timeout):
+        while True:
+            if await cache.aadd(key, delta, timeout):
+                return delta
+            try:
+                return await cache.aincr(key, delta)
+            except ValueError:
+                continue
+
+    async def aget(self, key):
+        return await cache.aget(key, 0)
+
+    def clear(self):
+        cache.clear()
+
+
+class SQLiteCounterStore:
+    """
+    Counters in a SQLite file: one upsert-and-return statement per increment, so the count
+    is exact across processes. Expired rows are swept now and then by the writers.
+    """
+    SWEEP_EVERY = 1000  # increments, on average
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_counter '
+                '(key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires REAL NOT NULL)'
+            )
+            self.local.conn = conn
+        return conn
+
+    def incr(self, key, delta, timeout):
+        conn = self.connection()
+        now = time.time()
+        if random.randrange(self.SWEEP_EVERY) == 0:
+            conn.execute('DELETE FROM throttle_counter WHERE expires < ?', [now])
+        return conn.execute(
+            'INSERT INTO throttle_counter (key, count, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET count = count + excluded.count RETURNING count',
+            [key, delta, now + timeout],
+        ).fetchone()[0]
+
+    def clear(self):
+        self.connection().execute('DELETE FROM throttle_counter')
+
+    def get(self, key):
+        row = self.connection().execute('SELECT count FROM throttle_counter WHERE key = ?', [key]).fetchone()
+        return row[0] if row else 0
+
+    # Own thread per call: never block the event loop on the file lock
+    async def aincr(self, key, delta, timeout):
+        return await sync_to_async(self.incr, thread_sensitive=False)(key, delta, timeout)
+
+    async def aget(self, key):
+        return await sync_to_async(self.get, thread_sensitive=False)(key)
+
+
+# Cache backends whose counters every worker sees (class names, so django-redis etc. count)
+SHARED_CACHE_BACKENDS = {'RedisCache', 'PyMemcacheCache', 'PyLibMCCache', 'MemcachedCache'}
+
+_stores = {}
+
+
+def store_path():
+    # None: counters go to the default cache
+    path = getattr(settings, 'THROTTLE_STORE', None)
+    if path:
+        return str(path)
+    if settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1] in SHARED_CACHE_BACKENDS:
+        return None
+    return str(settings.BASE_DIR / 'throttle.sqlite3')
+
+
+def get_store():
+    path = store_path()
+    if path not in _stores:
+        _stores[path] = SQLiteCounterStore(path) if path else CacheCounterStore()
+    return _stores[path]
+
+
+class SlidingWindowMixin:
+    # Replaces SimpleRateThrottle's timestamp history; rate parsing and cache keys are DRF's
+
+    def window_keys(self):
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now / self.duration - window  # fraction of the current window gone
+        return f'{self.key}:{window}', f'{self.key}:{window - 1}'
+
+    def prepare(self, request, view):
+        # False when this request is not throttled at all
+        if self.rate is None:
+            return False
+        self.key = self.get_cache_key(request, view)
+        return self.key is not None
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed) + self.current
+
+    def allow_request(self, request, view):
+        if not self.prepare(request, view):
+            return True
+        store = get_store()
+        current_key, previous_key = self.window_keys()
+        # Previous window expires when it stops counting; the current one outlives it by one window
+        self.current = store.incr(current_key, 1, self.duration * 2)
+        self.previous = store.get(previous_key)
+        if self.estimate() > self.num_requests:
+            self.current = store.incr(current_key, -1, self.duration * 2)  # refused requests do not count
+            return self.throttle_failure()
+        return True
+
+    async def aallow_request(self, request, view):
+        if not self.prepare(request, view):
+            return True
+        store = get_store()
+        current_key, previous_key = self.window_keys()
+        self.current = await store.aincr(current_key, 1, self.duration * 2)
+        self.previous = await store.aget(previous_key)
+        if self.estimate() > self.num_requests:
+            self.current = await store.aincr(current_key, -1, self.duration * 2)
+            return self.throttle_failure()
+        return True
+
+    def wait(self):
+        # Seconds until one more request fits under the estimate
+        if self.current < self.num_requests and self.previous:
+            # Within this window, once enough of the previous window's weight has decayed
+            needed = 1 - (self.num_requests - self.current - 1) / self.previous
+            return max(0.0, needed - self.elapsed) * self.duration
+        # After this window ends, once enough of its own weight has decayed
+        needed = max(0.0, 1 - (self.num_requests - 1) / self.current) if self.current else 0.0
+        return (1 - self.elapsed + needed) * self.duration
+
+
+class AnonRateThrottle(SlidingWindowMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(SlidingWindowMixin, throttling.UserRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(SlidingWindowMixin, throttling.ScopedRateThrottle):
+    def prepare(self, request, view):
+        # Scope comes from the view, so the rate is only known now (as in DRF's allow_request)
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return False
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().prepare(request, view)
+
@@ -1,14 +1,35 @@
+from django.conf import settings
 from django.urls import path
 from .import views
+from .async_views import with_async_reads
+from . import async_views
+
+
+def read_view(name):
+    # Under ASGI (ASYNC_READ_VIEWS) GETs are served by the async view of the same name
+    sync_view = getattr(views, name).as_view()
+    if settings.ASYNC_READ_VIEWS:
+        return with_async_reads(sync_view, getattr(async_views, name).as_view())
+    return sync_view
+
 
 urlpatterns=[
-    path('menu-items', views.MenuItemsView.as_view()),                 # /api/menu-items
-    path('menu-items/<int:pk>', views.SingleMenuItemView.as_view()), 
+    path('menu-items', read_view('MenuItemsView')),                 # /api/menu-items
+    path('menu-items/<int:pk>', read_view('SingleMenuItemView')), 
+    path('menu-items/bulk', views.MenuItemsBulkView.as_view()),                # Manager, CSV / NDJSON
     path('groups/manager/users', views.ManagerGroupView.as_view()),                 # GET & POST
     path('groups/manager/users/<int:user_id>', views.ManagerGroupView.as_view()),   # DELETE
     path('groups/delivery-crew/users', views.DeliveryCrewGroupView.as_view()),      # GET & POST
     path('groups/delivery-crew/users/<int:user_id>', views.DeliveryCrewGroupView.as_view()),  # DELETE
-    path('cart/menu-items', views.CartView.as_view()),
-    path('orders', views.OrdersView.as_view()),            
-    path('orders/<int:pk>', views.SingleOrderView.as_view()),
+    path('cart/menu-items', read_view('CartView')),
+    path('orders', read_view('OrdersView')),            
+    path('orders/<int:pk>', read_view('SingleOrderView')),
+    path('orders/events', async_views.OrderEventsView.as_view()),              # server-sent events (ASGI)
+    path('orders/bulk', views.BulkOrderUpdateView.as_view()),                   # Manager & Delivery crew
+    path('orders/export', views.OrderExportView.as_view()),                     # Manager, CSV / NDJSON
+    path('orders/dispatch', views.DispatchView.as_view()),                      # Manager
+    path('reports/daily-revenue', views.DailyRevenueReportView.as_view()),        # Manager
+    path('reports/menu-items', views.MenuItemSalesReportView.as_view()),          # Manager
+    path('reports/delivery-crew', views.DeliveryCrewReportView.as_view()),        # Manager
+    path('metrics', views.MetricsView.as_view()),                                 # Manager, Prometheus text
 ]
\ No newline at end of file
@@ -1,7 +1,10 @@
 # Django & third-party
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
+from django.db.models import Prefetch, Sum
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
@@ -9,36 +12,63 @@ from rest_framework import generics, permissions, status
 from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from .models import (
     MenuItem,
     CartItem,
     Order,
     OrderItem,
+    DailySales,
+    MenuItemSales,
+    DeliveryCrewStats,
 )
 from .serializers import (
     MenuItemSerializer,
     CartItemSerializer,
     AddCartItemSerializer,
+    AddCartItemsSerializer,
     OrderSerializer,
+    DailySalesSerializer,
+    MenuItemSalesSerializer,
+    DeliveryCrewStatsSerializer,
+    DispatchSerializer,
+    BulkOrderUpdateSerializer,
 )
 from .permissions import (
     IsManager,
     IsCustomer,
     IsDeliveryCrew,
 )
-from .pagination import DefaultPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter, SearchFilter
-from .pagination import DefaultPagination
-from .filters import MenuItemFilter, OrderFilter
-from rest_framework.throttling import ScopedRateThrottle
-
-class MenuItemsView(APIView):
+from .roles import is_delivery_crew, is_manager
+from .pagination import DefaultPagination, SelectablePaginationMixin
+from .cache import MenuCacheMixin
+from .idempotency import idempotent
+from .rollups import record_delivery_change, record_delivery_changes
+from .services import EmptyCart, InsufficientStock, checkout
+from .dispatch import dispatch
+from .events import DELETED, UPDATED, instance_event, order_event, publish_order_events
+from .streaming import CSV_CONTENT_TYPE, NDJSON_CONTENT_TYPE, STREAM_CHUNK_SIZE, ndjson_response, streaming_response
+from .filters import MenuItemFilter, OrderFilter, RollupDateFilter
+from . import fastpath
+from .fastpath import FastListMixin
+from .renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer, PrometheusRenderer
+from . import menu_bulk, order_export
+from . import metrics
+from .throttling import ScopedRateThrottle
+
+class MenuItemsView(MenuCacheMixin, SelectablePaginationMixin, FastListMixin, generics.ListCreateAPIView):
+    # Most queries per request, caches cold, at any data size (metrics.check_budget, QueryBudgetTests).
+    # POSTs under @idempotent allow 7 more for the Idempotency-Key row (claim or take over, expire,
+    # store), or for a duplicate's polls while it waits for the first request.
+    # A cold token costs 2 on any method: the token with its user, and the user's roles
+    query_budget = {'GET': 4, 'POST': 11}
     # throttle scope based
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = 'menu'
+    renderer_classes = [FastJSONRenderer]
     # filtering and sorting
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
@@ -48,17 +78,27 @@ class MenuItemsView(APIView):
     search_fields = ['title']                         # /api/menu-items?search=margh
     ordering_fields = ['price', 'title', 'inventory'] # /api/menu-items?ordering=-price,title
     ordering = ['title']
+    stream_fields = ['id', 'title', 'price', 'inventory']  # same shape as MenuItemSerializer
+    # list() reads .values() rows and builds MenuItemSerializer's output without it
+    fast_fields = fastpath.menu_item_row.sources
+    fast_rows = staticmethod(fastpath.menu_items)
 
     def get_permissions(self):
         if self.request.method in ['POST']:
             return [permissions.IsAuthenticated(), IsManager()]
         return [permissions.IsAuthenticated()]  # Customer & Delivery crew can GET
 
-    def get(self, request):
-        items = MenuItem.objects.all()
-        serializer = MenuItemSerializer(items, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
+    # GET /api/menu-items                      -> page numbers (?page=&page_size=)
+    # GET /api/menu-items?pagination=cursor    -> keyset pages, no COUNT(*)
+    # GET /api/menu-items?stream=ndjson        -> whole filtered catalogue, one item per line
+    def get(self, request, *args, **kwargs):
+        if request.query_params.get('stream') == 'ndjson':
+            queryset = self.filter_queryset(self.get_queryset())
+            rows = queryset.values(*self.stream_fields).iterator(chunk_size=STREAM_CHUNK_SIZE)
+            return ndjson_response(rows)
+        return self.cached_response(request, lambda: self.list(request, *args, **kwargs))
+
+    @idempotent
     def post(self, request):
         serializer = MenuItemSerializer(data=request.data)
         if serializer.is_valid():
@@ -67,7 +107,8 @@ class MenuItemsView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SingleMenuItemView(APIView):
+class SingleMenuItemView(MenuCacheMixin, APIView):
+    query_budget = {'GET': 3, 'PUT': 5, 'PATCH': 5, 'DELETE': 7}
     # throttle scope based
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = 'menu'
@@ -81,6 +122,9 @@ class SingleMenuItemView(APIView):
         return [permissions.IsAuthenticated()]  # All authenticated users can GET
 
     def get(self, request, pk):
+        return self.cached_response(request, lambda: self._retrieve(pk))
+
+    def _retrieve(self, pk):
         try:
             item = MenuItem.objects.get(pk=pk)
         except MenuItem.DoesNotExist:
@@ -121,7 +165,47 @@ class SingleMenuItemView(APIView):
 
 User = get_user_model()
 
+def _is_asgi(request):
+    # Under ASGI a sync iterator would be read into memory before sending; exports stream async instead
+    return isinstance(request._request, ASGIRequest)
+
+
+class MenuItemsBulkView(APIView):
+    """
+    GET  /api/menu-items/bulk?format=csv|ndjson -> every menu item (id, title, price, inventory), streamed
+    POST /api/menu-items/bulk with a text/csv or application/x-ndjson body -> items upserted by title
+    Manager only. An import is all or nothing; invalid rows come back as a 400 with their line numbers.
+    """
+    # GET: the export is one query, run while streaming. POST runs 2 per STREAM_CHUNK_SIZE
+    # rows, so it has no fixed budget
+    query_budget = {'GET': 3, 'POST': None}
+    permission_classes = [IsManager]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'menu'
+    renderer_classes = [FastJSONRenderer, NDJSONRenderer, CSVRenderer]
+    parsers = {CSV_CONTENT_TYPE: menu_bulk.csv_rows, NDJSON_CONTENT_TYPE: menu_bulk.ndjson_rows}
+
+    def get(self, request):
+        file_format = 'csv' if request.accepted_renderer.format == 'csv' else 'ndjson'
+        lines = menu_bulk.export_lines(file_format, asynchronous=_is_asgi(request))
+        content_type = CSV_CONTENT_TYPE if file_format == 'csv' else NDJSON_CONTENT_TYPE
+        return streaming_response(lines, content_type, f'menu-items.{file_format}')
+
+    def post(self, request):
+        media_type = (request.content_type or '').split(';')[0].strip().lower()
+        rows = self.parsers.get(media_type)
+        if rows is None:
+            return Response({'detail': f'Content-Type must be {CSV_CONTENT_TYPE} or {NDJSON_CONTENT_TYPE}.'},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        try:
+            summary = menu_bulk.import_rows(rows(request.stream or ()))
+        except menu_bulk.ImportFailed as e:
+            return Response({'detail': 'Nothing was imported.', 'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+
+
 class ManagerGroupView(APIView):
+    query_budget = {'GET': 4, 'POST': 7, 'DELETE': 7}  # writes: + the members' Token keys to revoke
     permission_classes = [IsManager]
 
     def get(self, request):
@@ -145,6 +229,7 @@ class ManagerGroupView(APIView):
 
 
 class DeliveryCrewGroupView(APIView):
+    query_budget = {'GET': 4, 'POST': 7, 'DELETE': 7}  # writes: + the members' Token keys to revoke
     permission_classes = [IsManager]
 
     def get(self, request):
@@ -168,6 +253,7 @@ class DeliveryCrewGroupView(APIView):
     
 
 class CartView(APIView):
+    query_budget = {'GET': 3, 'POST': 16, 'DELETE': 3}
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = 'cart'
 
@@ -181,8 +267,12 @@ class CartView(APIView):
 
     # POST /api/cart/menu-items  -> add (or increase) an item
     # Body: { "menuitem_id": <int>, "quantity": <int> }
+    #   or: { "items": [ { "menuitem_id": <int>, "quantity": <int> }, ... ] }
+    @idempotent
     @transaction.atomic
     def post(self, request):
+        if 'items' in request.data:
+            return self._post_many(request)
         serializer = AddCartItemSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -206,61 +296,138 @@ class CartView(APIView):
 
         return Response(CartItemSerializer(cart_item).data, status=status.HTTP_201_CREATED)
 
+    def _post_many(self, request):
+        # Batch add: one IN query to validate, one INSERT ... ON CONFLICT for every line,
+        # then the whole updated cart is returned
+        serializer = AddCartItemsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        lines = serializer.validated_data['items']
+
+        current = dict(
+            CartItem.objects.select_for_update()
+            .filter(user=request.user, menuitem_id__in=[line['menuitem_id'] for line in lines])
+            .values_list('menuitem_id', 'quantity')
+        )
+        rows = []
+        for line in lines:
+            qty = current.get(line['menuitem_id'], 0) + line['quantity']
+            unit_price = line['unit_price']
+            rows.append(CartItem(
+                user=request.user, menuitem_id=line['menuitem_id'],
+                quantity=qty, unit_price=unit_price, price=unit_price * qty,
+            ))
+        CartItem.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user', 'menuitem'],
+            update_fields=['quantity', 'unit_price', 'price'],
+        )
+
+        items = CartItem.objects.filter(user=request.user).select_related('menuitem')
+        return Response(CartItemSerializer(items, many=True).data, status=status.HTTP_201_CREATED)
+
     # DELETE /api/cart/menu-items  -> clear current user's cart
     def delete(self, request):
         CartItem.objects.filter(user=request.user).delete()
         return Response({'message': 'Cart cleared'}, status=status.HTTP_200_OK)
     
 
-class OrdersView(generics.ListCreateAPIView):
+def _order_lines():
+    # Lines in id order, the order the fast path groups them in
+    return Prefetch('order_items', queryset=OrderItem.objects.select_related('menuitem').order_by('id'))
+
+
+def _names(value):
+    return None if value is None else [name for name in value.split(',') if name]
+
+
+class OrderFieldsMixin:
+    """
+    Sparse order responses:
+    ?fields=id,status,total   -> only those fields
+    ?expand=order_items       -> nested lines; without it, ?fields= leaves them out unless listed
+    With neither parameter orders have every field and their lines, as before.
+    Lines are only queried when they are returned.
+    """
+    def sparse_fields(self):
+        # (fields, expand) for OrderSerializer; either may be None
+        params = self.request.query_params
+        fields, expand = _names(params.get('fields')), _names(params.get('expand'))
+        unknown = sorted(set(fields or ()) - set(OrderSerializer.Meta.fields))
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown fields: {", ".join(unknown)}.']})
+        unknown = sorted(set(expand or ()) - set(OrderSerializer.expandable_fields))
+        if unknown:
+            raise ValidationError({'expand': [f'Cannot expand: {", ".join(unknown)}.']})
+        return fields, expand
+
+    def expands_items(self):
+        fields, expand = self.sparse_fields()
+        if fields is None and expand is None:
+            return True
+        return 'order_items' in (fields or ()) or 'order_items' in (expand or ())
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.sparse_fields()
+        return super().get_serializer(*args, fields=fields, expand=expand, **kwargs)
+
+
+class OrdersView(OrderFieldsMixin, SelectablePaginationMixin, FastListMixin, generics.ListCreateAPIView):
+    query_budget = {'GET': 5, 'POST': 20}
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = 'orders'
+    renderer_classes = [FastJSONRenderer]
     serializer_class = OrderSerializer
     pagination_class = DefaultPagination
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['status', 'user', 'delivery_crew']
+    filterset_class = OrderFilter                # status, user, delivery_crew, date_after, date_before
     ordering_fields = ['date', 'total', 'status']
     ordering = ['-date']
+    # list() reads .values() rows and builds OrderSerializer's output without it
+    fast_fields = fastpath.order_row.sources
+    fast_rows = staticmethod(fastpath.orders)
+
+    def get_fast_list(self):
+        fields, expand = self.sparse_fields()
+        expand_items = self.expands_items()
+        if fields is None:
+            return super().get_fast_list() if expand_items else (
+                self.fast_fields, lambda rows: fastpath.orders(rows, expand_items=False))
+        row = fastpath.sparse_order_row(frozenset(fields))
+        # id groups the lines; the ordering columns feed cursor positions
+        columns = sorted(set(row.sources) | set(self.ordering_fields) | {'id'})
+        return columns, lambda rows: fastpath.orders(rows, row=row, expand_items=expand_items)
 
     def get_queryset(self):
         u = self.request.user
-        if u.groups.filter(name='Manager').exists():
-            return Order.objects.all().prefetch_related('order_items__menuitem')
-        if u.groups.filter(name='Delivery crew').exists():
-            return Order.objects.filter(delivery_crew=u).prefetch_related('order_items__menuitem')
+        lines = _order_lines()
+        if is_manager(u):
+            return Order.objects.all().prefetch_related(lines)
+        if is_delivery_crew(u):
+            return Order.objects.filter(delivery_crew=u).prefetch_related(lines)
         # Customer
-        return Order.objects.filter(user=u).prefetch_related('order_items__menuitem')
+        return Order.objects.filter(user=u).prefetch_related(lines)
 
     def get_permissions(self):
         if self.request.method == 'POST':
             return [permissions.IsAuthenticated(), IsCustomer()]
         return [permissions.IsAuthenticated()]
 
-    @transaction.atomic
+    @idempotent
     def post(self, request, *args, **kwargs):
         # Create order from current user's cart, then clear cart
-        cart_items = CartItem.objects.select_for_update().filter(user=request.user).select_related('menuitem')
-        if not cart_items.exists():
-            return Response({'detail': 'Cart is empty.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        order = Order.objects.create(user=request.user, status=0, total=0)
-        total = 0
-        bulk = []
-        for ci in cart_items:
-            unit = ci.unit_price
-            line_total = ci.price
-            total += line_total
-            bulk.append(OrderItem(order=order, menuitem=ci.menuitem, quantity=ci.quantity, unit_price=unit, price=line_total))
-        OrderItem.objects.bulk_create(bulk)
-        order.total = total
-        order.save()
-
-        cart_items.delete()
-
+        try:
+            order = checkout(request.user)
+        except EmptyCart as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientStock as e:
+            return Response({'detail': str(e), 'items': e.shortages}, status=status.HTTP_400_BAD_REQUEST)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
 
-class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
+class SingleOrderView(OrderFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
+    query_budget = {'GET': 4, 'PUT': 9, 'PATCH': 9, 'DELETE': 10}
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = 'orders'
     
@@ -271,11 +438,11 @@ class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
         method = self.request.method
         u = self.request.user
         # Manager: full control
-        if u.groups.filter(name='Manager').exists():
+        if is_manager(u):
             if method in ['DELETE', 'PUT', 'PATCH', 'GET']:
                 return [permissions.IsAuthenticated(), IsManager()]
         # Delivery crew: can view assigned orders, and PATCH status only
-        if u.groups.filter(name='Delivery crew').exists():
+        if is_delivery_crew(u):
             if method in ['GET', 'PATCH']:
                 return [permissions.IsAuthenticated(), IsDeliveryCrew()]
             return [permissions.IsAuthenticated()]  # will 403 on forbidden
@@ -284,14 +451,30 @@ class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAuthenticated(), IsCustomer()]
         return [permissions.IsAuthenticated()]  # will 403 later
        
+    def get_read_queryset(self):
+        # GET loads only the requested columns (plus the two access control needs) and lines
+        fields, _ = self.sparse_fields()
+        queryset = Order.objects.all()
+        if fields is not None:
+            queryset = queryset.only(*{'user', 'delivery_crew'} | (set(fields) - {'order_items'}))
+        if self.expands_items():
+            queryset = queryset.prefetch_related(_order_lines())
+        return queryset
+
     def get_object(self):
-        obj = get_object_or_404(Order, pk=self.kwargs['pk'])
+        if self.request.method == 'GET':
+            queryset = self.get_read_queryset()
+        elif self.request.method in ('PUT', 'PATCH'):
+            queryset = Order.objects.prefetch_related(_order_lines())  # the response lists the lines
+        else:
+            queryset = Order
+        obj = get_object_or_404(queryset, pk=self.kwargs['pk'])
         u = self.request.user
 
         # Access control: Customer only own, Delivery crew only assigned
-        if u.groups.filter(name='Manager').exists():
+        if is_manager(u):
             return obj
-        if u.groups.filter(name='Delivery crew').exists():
+        if is_delivery_crew(u):
             if obj.delivery_crew_id == u.id:
                 return obj
             raise PermissionDenied('Forbidden.')
@@ -302,7 +485,7 @@ class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
 
     def put(self, request, *args, **kwargs):
         # Manager: can set delivery_crew and status (0/1)
-        if not request.user.groups.filter(name='Manager').exists():
+        if not is_manager(request.user):
             return Response({'detail': 'Forbidden.'}, status=status.HTTP_403_FORBIDDEN)
         partial = False
         return self._update_manager(request, partial)
@@ -310,16 +493,20 @@ class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
     def patch(self, request, *args, **kwargs):
         u = request.user
         # Manager full patch, Delivery crew status-only
-        if u.groups.filter(name='Manager').exists():
+        if is_manager(u):
             partial = True
             return self._update_manager(request, partial)
-        if u.groups.filter(name='Delivery crew').exists():
+        if is_delivery_crew(u):
             order = self.get_object()
             status_val = request.data.get('status', None)
             if status_val not in [0, 1, '0', '1']:
                 return Response({'status': ['Must be 0 or 1.']}, status=status.HTTP_400_BAD_REQUEST)
+            old_status = order.status
             order.status = int(status_val)
-            order.save()
+            with transaction.atomic():
+                order.save()
+                record_delivery_change(order, order.delivery_crew_id, old_status)
+                publish_order_events([instance_event(UPDATED, order, order.delivery_crew_id)])
             return Response(OrderSerializer(order).data, status=status.HTTP_200_OK)
         return Response({'detail': 'Forbidden.'}, status=status.HTTP_403_FORBIDDEN)
 
@@ -339,14 +526,178 @@ class SingleOrderView(generics.RetrieveUpdateDestroyAPIView):
 
         serializer = OrderSerializer(order, data=allowed, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            old_crew_id, old_status = order.delivery_crew_id, order.status
+            with transaction.atomic():
+                serializer.save()
+                record_delivery_change(order, old_crew_id, old_status)
+                publish_order_events([instance_event(UPDATED, order, old_crew_id)])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, *args, **kwargs):
         # Manager only
-        if not request.user.groups.filter(name='Manager').exists():
+        if not is_manager(request.user):
             return Response({'detail': 'Forbidden.'}, status=status.HTTP_403_FORBIDDEN)
         order = self.get_object()
-        order.delete()
-        return Response(status=status.HTTP_200_OK)
\ No newline at end of file
+        with transaction.atomic():
+            publish_order_events([instance_event(DELETED, order, order.delivery_crew_id)])
+            order.delete()
+        return Response(status=status.HTTP_200_OK)
+
+class BulkOrderUpdateView(APIView):
+    """
+    PATCH /api/orders/bulk { "ids": [...], "status": 0|1, "delivery_crew": <id>|null }
+    SingleOrderView's rules for a set of orders: managers may set both fields on any order,
+    delivery crew may set status on their own orders only. One UPDATE for every permitted
+    order; each id is reported as updated, forbidden or not_found.
+    """
+    query_budget = {'PATCH': 8}
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'orders'
+
+    def patch(self, request):
+        u = request.user
+        manager = is_manager(u)
+        if not manager and not is_delivery_crew(u):
+            return Response({'detail': 'Forbidden.'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = BulkOrderUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        changes = dict(serializer.validated_data)
+        ids = list(dict.fromkeys(changes.pop('ids')))
+        if not manager and 'delivery_crew' in changes:
+            return Response({'detail': 'Delivery crew can only update status.'}, status=status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            rows = {
+                row['id']: row for row in Order.objects.select_for_update().filter(id__in=ids)
+                .values('id', 'date', 'user_id', 'delivery_crew_id', 'status')
+            }
+            # Delivery crew: only orders assigned to them
+            allowed = [pk for pk, row in rows.items() if manager or row['delivery_crew_id'] == u.id]
+            if 'delivery_crew' in changes:
+                crew = changes['delivery_crew']
+                changes['delivery_crew'] = crew.pk if crew is not None else None
+            Order.objects.filter(id__in=allowed).update(**changes)
+
+            new_crew = lambda row: changes.get('delivery_crew', row['delivery_crew_id'])
+            new_status = lambda row: changes.get('status', row['status'])
+            updated = [rows[pk] for pk in allowed]
+            record_delivery_changes([
+                (row['date'], row['delivery_crew_id'], row['status'], new_crew(row), new_status(row)) for row in updated
+            ])
+            publish_order_events([
+                order_event(UPDATED, row['id'], row['user_id'], new_crew(row), new_status(row), row['delivery_crew_id'])
+                for row in updated
+            ])
+
+        allowed = set(allowed)
+        results = [
+            {'id': pk, 'result': 'updated' if pk in allowed else 'forbidden' if pk in rows else 'not_found'}
+            for pk in ids
+        ]
+        return Response({'updated': len(allowed), 'results': results}, status=status.HTTP_200_OK)
+
+
+class OrderExportView(APIView):
+    """
+    GET /api/orders/export?date_after=&date_before=&format=csv|ndjson (also status, user, delivery_crew)
+    Every matching order, oldest first, streamed for accounting. NDJSON: one order per line,
+    with its lines, as /api/orders returns them. CSV: one row per order line.
+    """
+    # Two queries per EXPORT_CHUNK_SIZE orders (the orders, then their lines), run while
+    # streaming, so no fixed budget; OrderExportTests checks the count per chunk
+    query_budget = {'GET': None}
+    permission_classes = [IsManager]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'orders'
+    renderer_classes = [FastJSONRenderer, NDJSONRenderer, CSVRenderer]
+
+    def get(self, request):
+        filterset = OrderFilter(request.query_params, queryset=Order.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        file_format = 'csv' if request.accepted_renderer.format == 'csv' else 'ndjson'
+        lines = order_export.export_lines(filterset.qs, file_format, asynchronous=_is_asgi(request))
+        content_type = CSV_CONTENT_TYPE if file_format == 'csv' else NDJSON_CONTENT_TYPE
+        return streaming_response(lines, content_type, f'orders.{file_format}')
+
+
+class DispatchView(APIView):
+    # POST /api/orders/dispatch {"limit": 500, "capacity": 20}
+    # -> unassigned orders, oldest first, to the delivery crew with the fewest open deliveries
+    query_budget = {'POST': 8}
+    permission_classes = [IsManager]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'orders'
+
+    def post(self, request):
+        serializer = DispatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(dispatch(**serializer.validated_data), status=status.HTTP_200_OK)
+
+
+class ReportView(APIView):
+    # Manager reports read the sales rollups (one row per day and key), never the orders
+    query_budget = {'GET': 3}
+    permission_classes = [IsManager]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'orders'
+
+    def filter_dates(self, request, queryset):
+        filterset = RollupDateFilter(request.query_params, queryset=queryset)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return filterset.qs
+
+    def get_limit(self, request, default=20, maximum=100):
+        try:
+            return max(1, min(int(request.query_params.get('limit', default)), maximum))
+        except ValueError:
+            raise ValidationError({'limit': ['Must be an integer.']})
+
+
+class DailyRevenueReportView(ReportView):
+    # GET /api/reports/daily-revenue?date_after=&date_before=
+    def get(self, request):
+        rows = self.filter_dates(request, DailySales.objects.order_by('date'))
+        return Response(DailySalesSerializer(rows, many=True).data, status=status.HTTP_200_OK)
+
+
+class MenuItemSalesReportView(ReportView):
+    # GET /api/reports/menu-items?date_after=&date_before=&ordering=units|revenue&limit=20
+    def get(self, request):
+        ordering = request.query_params.get('ordering', 'units')
+        if ordering not in ('units', 'revenue'):
+            raise ValidationError({'ordering': ['Must be units or revenue.']})
+        rows = (
+            self.filter_dates(request, MenuItemSales.objects.all())
+            .values('menuitem', label=Coalesce('menuitem__title', 'title'))
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-' + ordering, 'menuitem')[:self.get_limit(request)]
+        )
+        return Response(MenuItemSalesSerializer(rows, many=True).data, status=status.HTTP_200_OK)
+
+
+class DeliveryCrewReportView(ReportView):
+    # GET /api/reports/delivery-crew?date_after=&date_before=
+    def get(self, request):
+        rows = (
+            self.filter_dates(request, DeliveryCrewStats.objects.all())
+            .values('delivery_crew', label=Coalesce('delivery_crew__name', 'name'))
+            .annotate(delivered=Sum('delivered'))
+            .order_by('-delivered', 'delivery_crew')
+        )
+        return Response(DeliveryCrewStatsSerializer(rows, many=True).data, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    # GET /api/metrics -> this worker's request histograms (RequestMetricsMiddleware), Prometheus text format
+    query_budget = {'GET': 2}
+    permission_classes = [IsManager]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(metrics.registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')